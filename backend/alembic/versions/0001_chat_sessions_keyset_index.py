@@ -0,0 +1,28 @@
+"""Add keyset pagination index on chat_sessions
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Tables are created by Base.metadata.create_all, which may already have built this index
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_created_at_id "
+        "ON chat_sessions (created_at DESC, id DESC)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_sessions_created_at_id", table_name="chat_sessions")
@@ -0,0 +1,24 @@
+"""Add content hash to documents
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)")
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "sha256")
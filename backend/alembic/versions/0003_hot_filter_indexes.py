@@ -0,0 +1,33 @@
+"""Add indexes for chat session and document hot filters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_workflow_created "
+        "ON chat_sessions (workflow_id, created_at DESC, id DESC)"
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_chat_sessions_session_id "
+        "ON chat_sessions (session_id)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_documents_sha256 ON documents (sha256)")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_sha256", table_name="documents")
+    op.drop_index("ix_chat_sessions_workflow_created", table_name="chat_sessions")
@@ -0,0 +1,28 @@
+"""Index chat_sessions.document_id
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Deleting a document clears document_id on its sessions
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_document_id "
+        "ON chat_sessions (document_id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_sessions_document_id", table_name="chat_sessions")
@@ -0,0 +1,18 @@
+from app.config import Settings, get_settings
+from app.services.knowledge_base_service import KnowledgeBaseService, get_knowledge_base_service
+from app.services.workflow_engine import WorkflowEngine, get_workflow_engine
+
+# FastAPI runs sync dependencies in the threadpool. These async wrappers hand
+# out the cached singletons on the event loop instead.
+
+
+async def provide_settings() -> Settings:
+    return get_settings()
+
+
+async def provide_knowledge_base_service() -> KnowledgeBaseService:
+    return get_knowledge_base_service()
+
+
+async def provide_workflow_engine() -> WorkflowEngine:
+    return get_workflow_engine()
@@ -1,34 +1,71 @@
 import uuid
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.models import ChatSession, Workflow, Document
-from app.schemas import ChatRequest, ChatResponse, ChatSessionResponse
+from datetime import datetime, timezone
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from typing import Any, Dict, List, Optional
+from app.cache import get_workflow_cached
+from app.database import SessionLocal, get_db
+from app.pagination import paginate, set_next_cursor
+from app.queries import CHAT_SESSION_BY_SESSION_ID, DOCUMENT_BY_ID
+from app.models import ChatSession
+from app.schemas import ChatRequest, ChatResponse, ChatSessionResponse, SendMessageRequest, WorkflowGraph
 from app.services.workflow_engine import WorkflowEngine
+from app.api.deps import provide_workflow_engine
+from app.streaming import EVENT_STREAM, accepts_event_stream, relay_workflow_events
 import structlog
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+# ChatSessionResponse only exposes the foreign key ids, so list queries must
+# never lazy-load the relationships (one extra SELECT per row)
+SESSION_LIST_OPTIONS = (raiseload(ChatSession.workflow), raiseload(ChatSession.document))
+
+
+async def save_chat_session(session_id: str, values: Dict[str, Any], update_existing: bool = False):
+    """Persist a chat session outside the request's database session"""
+    try:
+        async with SessionLocal() as db:
+            if update_existing:
+                result = await db.execute(CHAT_SESSION_BY_SESSION_ID, {"session_id": session_id})
+                chat_session = result.scalar_one_or_none()
+                if not chat_session:
+                    return
+                for field, value in values.items():
+                    setattr(chat_session, field, value)
+            else:
+                db.add(ChatSession(session_id=session_id, **values))
+            await db.commit()
+    except Exception as e:
+        logger.error("Failed to save chat session", error=str(e), session_id=session_id)
+
 
 @router.post("/execute", response_model=ChatResponse)
 async def execute_workflow(
     chat_request: ChatRequest,
-    db: Session = Depends(get_db)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    workflow_engine: WorkflowEngine = Depends(provide_workflow_engine),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Execute a workflow with a query"""
+    """Execute a workflow with a query
+
+    Streams the response as Server-Sent Events when the client sends
+    Accept: text/event-stream.
+    """
     try:
         # Get workflow
-        workflow = db.query(Workflow).filter(Workflow.id == chat_request.workflow_id).first()
+        workflow = await get_workflow_cached(db, chat_request.workflow_id)
         if not workflow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Workflow not found"
             )
         
-        if not workflow.is_active:
+        if not workflow["is_active"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Workflow is not active"
@@ -37,20 +74,53 @@ async def execute_workflow(
         # Get document if specified
         document = None
         if chat_request.document_id:
-            document = db.query(Document).filter(Document.id == chat_request.document_id).first()
+            result = await db.execute(DOCUMENT_BY_ID, {"id": chat_request.document_id})
+            document = result.scalar_one_or_none()
             if not document:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Document not found"
                 )
         
+        # Return the connection to the pool before the (possibly long) workflow run
+        await db.close()
+        
+        workflow_data = {
+            "nodes": workflow["nodes"],
+            "edges": workflow["edges"]
+        }
+        session_id = str(uuid.uuid4())
+        
+        def record_session(execution_result: Dict[str, Any]):
+            # Saved after the response has been sent
+            background_tasks.add_task(save_chat_session, session_id, {
+                "workflow_id": chat_request.workflow_id,
+                "document_id": chat_request.document_id,
+                "user_query": chat_request.query,
+                "system_response": execution_result["response"],
+                "context_used": execution_result.get("context_used"),
+                "execution_logs": execution_result.get("logs")
+            })
+        
+        if accepts_event_stream(request.headers):
+            def on_result(execution_result: Dict[str, Any]) -> Dict[str, Any]:
+                record_session(execution_result)
+                return {
+                    "session_id": session_id,
+                    "response": execution_result["response"],
+                    "context_used": execution_result.get("context_used"),
+                    "execution_logs": execution_result.get("logs"),
+                    "created_at": datetime.now(timezone.utc)
+                }
+            
+            events = workflow_engine.stream_workflow(
+                workflow_data, chat_request.query, chat_request.document_id
+            )
+            return StreamingResponse(relay_workflow_events(events, on_result), media_type=EVENT_STREAM)
+        
         # Execute workflow
-        workflow_engine = WorkflowEngine()
         execution_result = await workflow_engine.execute_workflow(
-            {
-                "nodes": workflow.nodes,
-                "edges": workflow.edges
-            },
+            workflow_data,
             chat_request.query,
             chat_request.document_id
         )
@@ -61,19 +131,7 @@ async def execute_workflow(
                 detail=f"Workflow execution failed: {execution_result.get('error', 'Unknown error')}"
             )
         
-        # Create chat session
-        session_id = str(uuid.uuid4())
-        chat_session = ChatSession(
-            session_id=session_id,
-            workflow_id=chat_request.workflow_id,
-            document_id=chat_request.document_id,
-            user_query=chat_request.query,
-            system_response=execution_result["response"],
-            context_used=execution_result.get("context_used"),
-            execution_logs=execution_result.get("logs")
-        )
-        db.add(chat_session)
-        db.commit()
+        record_session(execution_result)
         
         logger.info("Workflow executed successfully", 
                    session_id=session_id, workflow_id=chat_request.workflow_id)
@@ -83,7 +141,7 @@ async def execute_workflow(
             response=execution_result["response"],
             context_used=execution_result.get("context_used"),
             execution_logs=execution_result.get("logs"),
-            created_at=datetime.now()
+            created_at=datetime.now(timezone.utc)
         )
         
     except HTTPException:
@@ -98,21 +156,26 @@ async def execute_workflow(
 
 @router.get("/sessions", response_model=List[ChatSessionResponse])
 async def get_chat_sessions(
+    response: Response,
     workflow_id: int = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get chat sessions with optional workflow filter"""
+    """Get chat sessions with optional workflow filter, newest first"""
     try:
-        query = db.query(ChatSession)
+        query = select(ChatSession).options(*SESSION_LIST_OPTIONS)
         
         if workflow_id:
-            query = query.filter(ChatSession.workflow_id == workflow_id)
+            query = query.where(ChatSession.workflow_id == workflow_id)
         
-        sessions = query.order_by(ChatSession.created_at.desc()).offset(skip).limit(limit).all()
+        result = await db.execute(paginate(query, ChatSession, cursor, limit))
+        sessions = result.scalars().all()
+        set_next_cursor(response, sessions, limit)
         return sessions
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to get chat sessions", error=str(e))
         raise HTTPException(
@@ -124,11 +187,12 @@ async def get_chat_sessions(
 @router.get("/sessions/{session_id}", response_model=ChatSessionResponse)
 async def get_chat_session(
     session_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific chat session"""
     try:
-        session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+        result = await db.execute(CHAT_SESSION_BY_SESSION_ID, {"session_id": session_id})
+        session = result.scalar_one_or_none()
         if not session:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -146,24 +210,26 @@ async def get_chat_session(
         )
 
 
-@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
 async def delete_chat_session(
     session_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a chat session"""
     try:
-        session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-        if not session:
+        result = await db.execute(
+            delete(ChatSession).where(ChatSession.session_id == session_id).returning(ChatSession.id)
+        )
+        if result.scalar_one_or_none() is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Chat session not found"
             )
         
-        db.delete(session)
-        db.commit()
+        await db.commit()
         
         logger.info("Chat session deleted", session_id=session_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
         
     except HTTPException:
         raise
@@ -178,23 +244,27 @@ async def delete_chat_session(
 @router.get("/workflows/{workflow_id}/sessions", response_model=List[ChatSessionResponse])
 async def get_workflow_chat_sessions(
     workflow_id: int,
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all chat sessions for a specific workflow"""
     try:
         # Verify workflow exists
-        workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        workflow = await get_workflow_cached(db, workflow_id)
         if not workflow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Workflow not found"
             )
         
-        sessions = db.query(ChatSession).filter(
+        query = select(ChatSession).options(*SESSION_LIST_OPTIONS).where(
             ChatSession.workflow_id == workflow_id
-        ).order_by(ChatSession.created_at.desc()).offset(skip).limit(limit).all()
+        )
+        result = await db.execute(paginate(query, ChatSession, cursor, limit))
+        sessions = result.scalars().all()
+        set_next_cursor(response, sessions, limit)
         
         return sessions
         
@@ -210,33 +280,47 @@ async def get_workflow_chat_sessions(
 
 @router.post("/test")
 async def test_workflow(
-    workflow_data: dict,
+    workflow_graph: WorkflowGraph,
     query: str,
+    request: Request,
     document_id: int = None,
-    db: Session = Depends(get_db)
+    workflow_engine: WorkflowEngine = Depends(provide_workflow_engine),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Test a workflow without saving the session"""
+    """Test a workflow without saving the session
+
+    Streams the response as Server-Sent Events when the client sends
+    Accept: text/event-stream.
+    """
     try:
-        # Validate workflow data
-        if "nodes" not in workflow_data or "edges" not in workflow_data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid workflow data: missing nodes or edges"
-            )
-        
         # Verify document exists if specified
         if document_id:
-            document = db.query(Document).filter(Document.id == document_id).first()
+            result = await db.execute(DOCUMENT_BY_ID, {"id": document_id})
+            document = result.scalar_one_or_none()
             if not document:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Document not found"
                 )
         
+        # Return the connection to the pool before the (possibly long) workflow run
+        await db.close()
+        
+        if accepts_event_stream(request.headers):
+            def on_result(execution_result: Dict[str, Any]) -> Dict[str, Any]:
+                return {
+                    "success": True,
+                    "response": execution_result["response"],
+                    "execution_time": execution_result.get("execution_time"),
+                    "logs": execution_result.get("logs", [])
+                }
+            
+            events = workflow_engine.stream_workflow(workflow_graph.model_dump(), query, document_id)
+            return StreamingResponse(relay_workflow_events(events, on_result), media_type=EVENT_STREAM)
+        
         # Execute workflow
-        workflow_engine = WorkflowEngine()
         execution_result = await workflow_engine.execute_workflow(
-            workflow_data,
+            workflow_graph.model_dump(),
             query,
             document_id
         )
@@ -261,59 +345,70 @@ async def test_workflow(
 
 @router.post("/send")
 async def send_message(
-    message_data: dict,
-    db: Session = Depends(get_db)
+    message_request: SendMessageRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    workflow_engine: WorkflowEngine = Depends(provide_workflow_engine),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Send a message to a workflow and get response"""
+    """Send a message to a workflow and get response
+
+    Streams the response as Server-Sent Events when the client sends
+    Accept: text/event-stream.
+    """
     try:
-        message = message_data.get("message")
-        workflow_id = message_data.get("workflowId")
-        session_id = message_data.get("sessionId")
-        
-        if not message or not workflow_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Message and workflowId are required"
-            )
+        message = message_request.message
+        workflow_id = message_request.workflow_id
+        session_id = message_request.session_id
         
         # Get workflow
-        workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        workflow = await get_workflow_cached(db, workflow_id)
         if not workflow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Workflow not found"
             )
         
-        # Execute workflow
-        workflow_engine = WorkflowEngine()
-        execution_result = await workflow_engine.execute_workflow(
-            query=message,
-            nodes=workflow.nodes,
-            edges=workflow.edges,
-            db=db
-        )
+        # Return the connection to the pool before the (possibly long) workflow run
+        await db.close()
         
-        # Create or update session
-        if session_id:
-            chat_session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-            if chat_session:
-                chat_session.user_query = message
-                chat_session.system_response = execution_result.get("response", "")
-                chat_session.context_used = execution_result.get("context")
-                chat_session.execution_logs = execution_result.get("logs")
-                db.commit()
-        else:
-            session_id = str(uuid.uuid4())
-            chat_session = ChatSession(
-                session_id=session_id,
-                workflow_id=workflow_id,
-                user_query=message,
-                system_response=execution_result.get("response", ""),
-                context_used=execution_result.get("context"),
-                execution_logs=execution_result.get("logs")
-            )
-            db.add(chat_session)
-            db.commit()
+        workflow_data = {
+            "nodes": workflow["nodes"],
+            "edges": workflow["edges"]
+        }
+        
+        update_existing = bool(session_id)
+        session_id = session_id or str(uuid.uuid4())
+        
+        def record_session(execution_result: Dict[str, Any]):
+            values = {
+                "user_query": message,
+                "system_response": execution_result.get("response", ""),
+                "context_used": execution_result.get("context"),
+                "execution_logs": execution_result.get("logs")
+            }
+            if not update_existing:
+                values["workflow_id"] = workflow_id
+            # Saved after the response has been sent
+            background_tasks.add_task(save_chat_session, session_id, values, update_existing)
+        
+        if accepts_event_stream(request.headers):
+            def on_result(execution_result: Dict[str, Any]) -> Dict[str, Any]:
+                record_session(execution_result)
+                return {
+                    "sessionId": session_id,
+                    "response": execution_result.get("response", ""),
+                    "context": execution_result.get("context"),
+                    "logs": execution_result.get("logs"),
+                    "execution_time": execution_result.get("execution_time")
+                }
+            
+            events = workflow_engine.stream_workflow(workflow_data, message)
+            return StreamingResponse(relay_workflow_events(events, on_result), media_type=EVENT_STREAM)
+        
+        # Execute workflow
+        execution_result = await workflow_engine.execute_workflow(workflow_data, message)
+        record_session(execution_result)
         
         return {
             "sessionId": session_id,
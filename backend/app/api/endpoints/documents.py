@@ -1,24 +1,37 @@
+import asyncio
+import hashlib
 import os
 import uuid
 import aiofiles
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List
+import aiofiles.os
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from app.database import get_db
-from app.models import Document
+from app.pagination import paginate, set_next_cursor
+from app.queries import DOCUMENT_BY_ID, DOCUMENT_BY_SHA256
+from app.models import ChatSession, Document
 from app.schemas import DocumentResponse
 from app.services.knowledge_base_service import KnowledgeBaseService
-from app.config import settings
+from app.api.deps import provide_knowledge_base_service, provide_settings
+from app.config import Settings
 import structlog
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+HASH_OFFLOAD_SIZE = 256 * 1024  # hash chunks at least this big off the event loop
+
 
 @router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    kb_service: KnowledgeBaseService = Depends(provide_knowledge_base_service),
+    settings: Settings = Depends(provide_settings),
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload and process a document"""
     try:
@@ -27,7 +40,7 @@ async def upload_document(
         if file_extension not in settings.allowed_extensions:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File type {file_extension} not allowed. Allowed types: {settings.allowed_extensions}"
+                detail=f"File type {file_extension} not allowed. Allowed types: {', '.join(sorted(settings.allowed_extensions))}"
             )
         
         # Validate file size
@@ -38,39 +51,66 @@ async def upload_document(
             )
         
         # Create upload directory if it doesn't exist
-        os.makedirs(settings.upload_dir, exist_ok=True)
+        await aiofiles.os.makedirs(settings.upload_dir, exist_ok=True)
         
         # Generate unique filename
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = os.path.join(settings.upload_dir, unique_filename)
         
-        # Save file
+        # Stream file to disk, measuring and hashing it in the same pass
+        hasher = hashlib.sha256()
+        file_size = 0
         async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > settings.max_file_size:
+                    break
+                if len(chunk) >= HASH_OFFLOAD_SIZE:
+                    # OpenSSL releases the GIL while hashing large buffers
+                    await asyncio.to_thread(hasher.update, chunk)
+                else:
+                    hasher.update(chunk)
+                await f.write(chunk)
+        
+        if file_size > settings.max_file_size:
+            await aiofiles.os.remove(file_path)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File exceeds maximum allowed size {settings.max_file_size}"
+            )
+        
+        # Reuse the existing document if identical content was already uploaded
+        file_hash = hasher.hexdigest()
+        result = await db.execute(DOCUMENT_BY_SHA256, {"sha256": file_hash})
+        existing_document = result.scalar_one_or_none()
+        if existing_document:
+            await aiofiles.os.remove(file_path)
+            logger.info("Duplicate upload, reusing existing document",
+                       document_id=existing_document.id, filename=file.filename)
+            return existing_document
         
         # Create document record
         db_document = Document(
             filename=unique_filename,
             original_filename=file.filename,
             file_path=file_path,
-            file_size=len(content),
-            file_type=file_extension
+            file_size=file_size,
+            file_type=file_extension,
+            sha256=file_hash
         )
         db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
+        await db.commit()
+        await db.refresh(db_document)
         
         # Process document for embeddings
         try:
-            kb_service = KnowledgeBaseService()
             process_result = await kb_service.process_document(file_path, db_document.id)
             
             # Update document with content
             db_document.content = process_result.get("text_content", "")
             db_document.embeddings_created = True
-            db.commit()
-            db.refresh(db_document)
+            await db.commit()
+            await db.refresh(db_document)
             
             logger.info("Document uploaded and processed successfully", 
                        document_id=db_document.id, filename=file.filename)
@@ -94,15 +134,20 @@ async def upload_document(
 
 @router.get("/", response_model=List[DocumentResponse])
 async def get_documents(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all documents"""
+    """Get all documents, newest first"""
     try:
-        documents = db.query(Document).offset(skip).limit(limit).all()
+        result = await db.execute(paginate(select(Document), Document, cursor, limit))
+        documents = result.scalars().all()
+        set_next_cursor(response, documents, limit)
         return documents
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to get documents", error=str(e))
         raise HTTPException(
@@ -114,11 +159,12 @@ async def get_documents(
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific document"""
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
+        result = await db.execute(DOCUMENT_BY_ID, {"id": document_id})
+        document = result.scalar_one_or_none()
         if not document:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -136,36 +182,43 @@ async def get_document(
         )
 
 
-@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
 async def delete_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    kb_service: KnowledgeBaseService = Depends(provide_knowledge_base_service),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a document"""
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
+        # Detach chat sessions, then delete from database
+        await db.execute(
+            update(ChatSession).where(ChatSession.document_id == document_id).values(document_id=None)
+        )
+        result = await db.execute(
+            delete(Document).where(Document.id == document_id).returning(Document.file_path)
+        )
+        file_path = result.scalar_one_or_none()
+        if file_path is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Document not found"
             )
+        await db.commit()
         
         # Delete file from filesystem
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        try:
+            await aiofiles.os.remove(file_path)
+        except FileNotFoundError:
+            pass
         
         # Delete embeddings from ChromaDB
         try:
-            kb_service = KnowledgeBaseService()
             await kb_service.delete_document_embeddings(document_id)
         except Exception as e:
             logger.warning("Failed to delete embeddings", error=str(e), document_id=document_id)
         
-        # Delete from database
-        db.delete(document)
-        db.commit()
-        
         logger.info("Document deleted", document_id=document_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
         
     except HTTPException:
         raise
@@ -180,25 +233,26 @@ async def delete_document(
 @router.post("/{document_id}/reprocess")
 async def reprocess_document(
     document_id: int,
-    db: Session = Depends(get_db)
+    kb_service: KnowledgeBaseService = Depends(provide_knowledge_base_service),
+    db: AsyncSession = Depends(get_db)
 ):
     """Reprocess a document for embeddings"""
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
+        result = await db.execute(DOCUMENT_BY_ID, {"id": document_id})
+        document = result.scalar_one_or_none()
         if not document:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Document not found"
             )
         
-        if not os.path.exists(document.file_path):
+        if not await aiofiles.os.path.exists(document.file_path):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Document file not found on filesystem"
             )
         
         # Delete existing embeddings
-        kb_service = KnowledgeBaseService()
         await kb_service.delete_document_embeddings(document_id)
         
         # Reprocess document
@@ -207,7 +261,7 @@ async def reprocess_document(
         # Update document
         document.content = process_result.get("text_content", "")
         document.embeddings_created = True
-        db.commit()
+        await db.commit()
         
         logger.info("Document reprocessed", document_id=document_id)
         
@@ -227,28 +281,30 @@ async def reprocess_document(
         )
 
 
-@router.get("/{document_id}/chunks")
+@router.get("/{document_id}/chunks", response_class=ORJSONResponse)
 async def get_document_chunks(
     document_id: int,
-    db: Session = Depends(get_db)
+    kb_service: KnowledgeBaseService = Depends(provide_knowledge_base_service),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all chunks for a specific document"""
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
+        result = await db.execute(DOCUMENT_BY_ID, {"id": document_id})
+        document = result.scalar_one_or_none()
         if not document:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Document not found"
             )
         
-        kb_service = KnowledgeBaseService()
         chunks = await kb_service.get_document_chunks(document_id)
         
-        return {
+        # Chroma returns plain strings and numbers, so skip jsonable_encoder
+        return ORJSONResponse(content={
             "document_id": document_id,
             "chunks": chunks,
             "total_chunks": len(chunks)
-        }
+        })
         
     except HTTPException:
         raise
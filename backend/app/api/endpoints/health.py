@@ -1,7 +1,12 @@
-from datetime import datetime
+import asyncio
+from datetime import datetime, timezone
+from typing import Awaitable
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db, engine
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import redis_client
+from app.database import get_db
 from app.schemas import HealthCheck
 from app.config import settings
 import structlog
@@ -9,43 +14,46 @@ import structlog
 logger = structlog.get_logger()
 router = APIRouter()
 
+PROBE_TIMEOUT = 2.0  # seconds
+
+
+def _check_chromadb():
+    """Open the knowledge base collection (blocking)"""
+    from app.services.knowledge_base_service import get_knowledge_base_service
+    kb_service = get_knowledge_base_service()
+    # Try to access the collection
+    _ = kb_service.collection
+
+
+async def _probe(name: str, check: Awaitable, critical: bool = True) -> str:
+    """Run a single dependency check under a timeout"""
+    try:
+        await asyncio.wait_for(check, timeout=PROBE_TIMEOUT)
+        return "healthy"
+    except asyncio.TimeoutError:
+        error = f"timed out after {PROBE_TIMEOUT}s"
+    except Exception as e:
+        error = str(e)
+    
+    log = logger.error if critical else logger.warning
+    log(f"{name} health check failed", error=error)
+    return f"unhealthy: {error}"
+
 
 @router.get("/health", response_model=HealthCheck)
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_db)):
     """Health check endpoint"""
     try:
-        # Check database connection
-        db_status = "healthy"
-        try:
-            db.execute("SELECT 1")
-        except Exception as e:
-            db_status = f"unhealthy: {str(e)}"
-            logger.error("Database health check failed", error=str(e))
-        
-        # Check ChromaDB
-        chromadb_status = "healthy"
-        try:
-            from app.services.knowledge_base_service import KnowledgeBaseService
-            kb_service = KnowledgeBaseService()
-            # Try to access the collection
-            _ = kb_service.collection
-        except Exception as e:
-            chromadb_status = f"unhealthy: {str(e)}"
-            logger.error("ChromaDB health check failed", error=str(e))
-        
-        # Check Redis (if configured)
-        redis_status = "healthy"
-        try:
-            import redis
-            r = redis.from_url(settings.redis_url)
-            r.ping()
-        except Exception as e:
-            redis_status = f"unhealthy: {str(e)}"
-            logger.warning("Redis health check failed", error=str(e))
+        # Probe all dependencies concurrently; Redis is optional
+        db_status, chromadb_status, redis_status = await asyncio.gather(
+            _probe("Database", db.execute(text("SELECT 1"))),
+            _probe("ChromaDB", asyncio.to_thread(_check_chromadb)),
+            _probe("Redis", redis_client.ping(), critical=False)
+        )
         
         return HealthCheck(
             status="healthy" if all(s == "healthy" for s in [db_status, chromadb_status]) else "degraded",
-            timestamp=datetime.now(),
+            timestamp=datetime.now(timezone.utc),
             version=settings.app_version,
             database=db_status,
             chromadb=chromadb_status,
@@ -56,7 +64,7 @@ async def health_check(db: Session = Depends(get_db)):
         logger.error("Health check failed", error=str(e))
         return HealthCheck(
             status="unhealthy",
-            timestamp=datetime.now(),
+            timestamp=datetime.now(timezone.utc),
             version=settings.app_version,
             database="unknown",
             chromadb="unknown",
@@ -64,13 +72,15 @@ async def health_check(db: Session = Depends(get_db)):
         )
 
 
-@router.get("/ready")
+# Probes are hit constantly; returning the response directly skips
+# FastAPI's jsonable_encoder pass and orjson renders UTC datetimes natively
+@router.get("/ready", response_class=ORJSONResponse)
 async def readiness_check():
     """Readiness check endpoint"""
-    return {"status": "ready", "timestamp": datetime.now()}
+    return ORJSONResponse({"status": "ready", "timestamp": datetime.now(timezone.utc)})
 
 
-@router.get("/live")
+@router.get("/live", response_class=ORJSONResponse)
 async def liveness_check():
     """Liveness check endpoint"""
-    return {"status": "alive", "timestamp": datetime.now()} 
\ No newline at end of file
+    return ORJSONResponse({"status": "alive", "timestamp": datetime.now(timezone.utc)}) 
\ No newline at end of file
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.cache import get_workflow_cached, invalidate_workflow
 from app.database import get_db
-from app.models import Workflow
-from app.schemas import WorkflowCreate, WorkflowUpdate, WorkflowResponse
+from app.pagination import paginate, set_next_cursor
+from app.queries import WORKFLOW_BY_ID
+from app.models import ChatSession, Workflow
+from app.schemas import ExecuteRequest, WorkflowCreate, WorkflowUpdate, WorkflowResponse
 from app.services.workflow_engine import WorkflowEngine
+from app.api.deps import provide_workflow_engine
 import structlog
 
 logger = structlog.get_logger()
@@ -14,7 +19,7 @@ router = APIRouter()
 @router.post("/", response_model=WorkflowResponse, status_code=status.HTTP_201_CREATED)
 async def create_workflow(
     workflow: WorkflowCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new workflow"""
     try:
@@ -25,8 +30,8 @@ async def create_workflow(
             edges=workflow.edges
         )
         db.add(db_workflow)
-        db.commit()
-        db.refresh(db_workflow)
+        await db.commit()
+        await db.refresh(db_workflow)
         
         logger.info("Workflow created", workflow_id=db_workflow.id, name=workflow.name)
         return db_workflow
@@ -41,15 +46,20 @@ async def create_workflow(
 
 @router.get("/", response_model=List[WorkflowResponse])
 async def get_workflows(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all workflows"""
+    """Get all workflows, newest first"""
     try:
-        workflows = db.query(Workflow).offset(skip).limit(limit).all()
+        result = await db.execute(paginate(select(Workflow), Workflow, cursor, limit))
+        workflows = result.scalars().all()
+        set_next_cursor(response, workflows, limit)
         return workflows
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to get workflows", error=str(e))
         raise HTTPException(
@@ -61,11 +71,12 @@ async def get_workflows(
 @router.get("/{workflow_id}", response_model=WorkflowResponse)
 async def get_workflow(
     workflow_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific workflow"""
     try:
-        workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        result = await db.execute(WORKFLOW_BY_ID, {"id": workflow_id})
+        workflow = result.scalar_one_or_none()
         if not workflow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -87,11 +98,12 @@ async def get_workflow(
 async def update_workflow(
     workflow_id: int,
     workflow_update: WorkflowUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a workflow"""
     try:
-        db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        result = await db.execute(WORKFLOW_BY_ID, {"id": workflow_id})
+        db_workflow = result.scalar_one_or_none()
         if not db_workflow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -103,8 +115,9 @@ async def update_workflow(
         for field, value in update_data.items():
             setattr(db_workflow, field, value)
         
-        db.commit()
-        db.refresh(db_workflow)
+        await db.commit()
+        await db.refresh(db_workflow)
+        await invalidate_workflow(workflow_id)
         
         logger.info("Workflow updated", workflow_id=workflow_id)
         return db_workflow
@@ -119,24 +132,31 @@ async def update_workflow(
         )
 
 
-@router.delete("/{workflow_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{workflow_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
 async def delete_workflow(
     workflow_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a workflow"""
     try:
-        db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
-        if not db_workflow:
+        # Detach chat sessions, then delete the workflow
+        await db.execute(
+            update(ChatSession).where(ChatSession.workflow_id == workflow_id).values(workflow_id=None)
+        )
+        result = await db.execute(
+            delete(Workflow).where(Workflow.id == workflow_id).returning(Workflow.id)
+        )
+        if result.scalar_one_or_none() is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Workflow not found"
             )
         
-        db.delete(db_workflow)
-        db.commit()
+        await db.commit()
+        await invalidate_workflow(workflow_id)
         
         logger.info("Workflow deleted", workflow_id=workflow_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
         
     except HTTPException:
         raise
@@ -151,20 +171,20 @@ async def delete_workflow(
 @router.post("/{workflow_id}/validate")
 async def validate_workflow(
     workflow_id: int,
-    db: Session = Depends(get_db)
+    workflow_engine: WorkflowEngine = Depends(provide_workflow_engine),
+    db: AsyncSession = Depends(get_db)
 ):
     """Validate a workflow structure"""
     try:
-        workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        workflow = await get_workflow_cached(db, workflow_id)
         if not workflow:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Workflow not found"
             )
         
-        workflow_engine = WorkflowEngine()
         validation_result = workflow_engine._validate_workflow(
-            workflow.nodes, workflow.edges
+            workflow["nodes"], workflow["edges"]
         )
         
         return {
@@ -185,33 +205,22 @@ async def validate_workflow(
 
 @router.post("/execute")
 async def execute_workflow(
-    workflow_data: dict,
-    db: Session = Depends(get_db)
+    execute_request: ExecuteRequest,
+    workflow_engine: WorkflowEngine = Depends(provide_workflow_engine)
 ):
     """Execute a workflow with a query"""
     try:
-        workflow_id = workflow_data.get("workflowId")
-        query = workflow_data.get("query")
-        nodes = workflow_data.get("nodes", [])
-        edges = workflow_data.get("edges", [])
-        
-        if not query:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Query is required"
-            )
-        
-        workflow_engine = WorkflowEngine()
         result = await workflow_engine.execute_workflow(
-            query=query,
-            nodes=nodes,
-            edges=edges,
-            db=db
+            {
+                "nodes": execute_request.nodes,
+                "edges": execute_request.edges
+            },
+            execute_request.query
         )
         
         return {
-            "workflow_id": workflow_id,
-            "query": query,
+            "workflow_id": execute_request.workflow_id,
+            "query": execute_request.query,
             "response": result.get("response"),
             "context": result.get("context"),
             "logs": result.get("logs"),
@@ -1,7 +1,8 @@
 from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 from app.api.endpoints import workflows, documents, chat, health
 
-api_router = APIRouter()
+api_router = APIRouter(default_response_class=ORJSONResponse)
 
 # Include all endpoint routers
 api_router.include_router(workflows.router, prefix="/workflows", tags=["workflows"])
@@ -0,0 +1,81 @@
+import orjson
+import redis.asyncio as redis
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.queries import WORKFLOW_BY_ID
+import structlog
+
+logger = structlog.get_logger()
+
+# Shared Redis client (one connection pool per process)
+redis_client = redis.from_url(
+    settings.redis_url,
+    socket_timeout=settings.redis_socket_timeout,
+    socket_connect_timeout=settings.redis_socket_timeout
+)
+
+
+async def cache_get(key: str) -> Optional[Any]:
+    """Read a JSON value from Redis, treating any cache failure as a miss"""
+    try:
+        cached = await redis_client.get(key)
+    except Exception as e:
+        logger.warning("Cache read failed", error=str(e), key=key)
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+
+async def cache_set(key: str, value: Any, ttl: int):
+    """Write a JSON value to Redis with a TTL"""
+    try:
+        await redis_client.set(key, orjson.dumps(value), ex=ttl)
+    except Exception as e:
+        logger.warning("Cache write failed", error=str(e), key=key)
+
+
+async def cache_delete(*keys: str):
+    """Drop keys from Redis"""
+    try:
+        await redis_client.delete(*keys)
+    except Exception as e:
+        logger.warning("Cache delete failed", error=str(e), keys=keys)
+
+
+async def cache_incr(key: str):
+    """Increment a counter in Redis"""
+    try:
+        await redis_client.incr(key)
+    except Exception as e:
+        logger.warning("Cache increment failed", error=str(e), key=key)
+
+
+def workflow_cache_key(workflow_id: int) -> str:
+    return f"workflow:{workflow_id}"
+
+
+async def get_workflow_cached(db: AsyncSession, workflow_id: int) -> Optional[Dict[str, Any]]:
+    """Get the executable parts of a workflow, reading through Redis"""
+    key = workflow_cache_key(workflow_id)
+    cached = await cache_get(key)
+    if cached is not None:
+        return cached
+
+    result = await db.execute(WORKFLOW_BY_ID, {"id": workflow_id})
+    workflow = result.scalar_one_or_none()
+    if not workflow:
+        return None
+
+    workflow_data = {
+        "id": workflow.id,
+        "nodes": workflow.nodes,
+        "edges": workflow.edges,
+        "is_active": workflow.is_active
+    }
+    await cache_set(key, workflow_data, settings.workflow_cache_ttl)
+    return workflow_data
+
+
+async def invalidate_workflow(workflow_id: int):
+    """Drop a cached workflow after it changes"""
+    await cache_delete(workflow_cache_key(workflow_id))
@@ -1,12 +1,18 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+from anyio import to_thread
 import structlog
 from app.config import settings
 from app.api.router import api_router
 from app.database import engine, Base
+from app.pagination import NEXT_CURSOR_HEADER
+from app.services.llm_service import get_llm_service
+from app.services.web_search_service import get_web_search_service
+from app.services.workflow_engine import get_workflow_engine
+from app.streaming import EventStreamAwareGZipMiddleware
 import time
 
 # Configure structured logging
@@ -37,17 +43,30 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting AI Stack Backend", version=settings.app_version)
     
+    # Sync dependencies and def endpoints run on anyio's thread pool (40 by default)
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    
     # Create database tables
     try:
-        Base.metadata.create_all(bind=engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error("Failed to create database tables", error=str(e))
     
+    # Build the shared engine and its services (clients, vector store) before the first request
+    try:
+        get_workflow_engine()
+    except Exception as e:
+        logger.error("Failed to initialize workflow services", error=str(e))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down AI Stack Backend")
+    await get_web_search_service().aclose()
+    await get_llm_service().aclose()
+    await engine.dispose()
 
 
 # Create FastAPI app
@@ -57,6 +76,7 @@ app = FastAPI(
     description="AI Stack Backend - No-Code/Low-Code Workflow Builder",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -67,8 +87,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Compress large JSON payloads (session lists, execution logs)
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
 # Add trusted host middleware
 app.add_middleware(
     TrustedHostMiddleware,
@@ -112,7 +136,7 @@ async def global_exception_handler(request: Request, exc: Exception):
         method=request.method,
         url=str(request.url)
     )
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
@@ -139,5 +163,8 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.debug
+        reload=settings.debug,
+        workers=None if settings.debug else settings.uvicorn_workers,
+        loop=settings.uvicorn_loop,
+        http=settings.uvicorn_http
     ) 
\ No newline at end of file
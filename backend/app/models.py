@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -29,6 +29,7 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=False)
     file_type = Column(String(50), nullable=False)
+    sha256 = Column(String(64), nullable=True, index=True)  # Content hash for upload dedup
     content = Column(Text, nullable=True)  # Extracted text content
     embeddings_created = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -43,7 +44,7 @@ class ChatSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(255), unique=True, index=True)
     workflow_id = Column(Integer, ForeignKey("workflows.id"))
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True, index=True)
     user_query = Column(Text, nullable=False)
     system_response = Column(Text, nullable=False)
     context_used = Column(JSON, nullable=True)  # Context from knowledge base
@@ -52,4 +53,11 @@ class ChatSession(Base):
     
     # Relationships
     workflow = relationship("Workflow", back_populates="chat_sessions")
-    document = relationship("Document", back_populates="chat_sessions") 
\ No newline at end of file
+    document = relationship("Document", back_populates="chat_sessions")
+    
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC
+        Index("ix_chat_sessions_created_at_id", created_at.desc(), id.desc()),
+        # Same ordering within one workflow's sessions; also serves workflow_id lookups
+        Index("ix_chat_sessions_workflow_created", workflow_id, created_at.desc(), id.desc()),
+    ) 
\ No newline at end of file
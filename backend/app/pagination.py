@@ -0,0 +1,41 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+import orjson
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(row: Any) -> str:
+    """Encode the (created_at, id) keyset position of a row"""
+    payload = orjson.dumps([row.created_at.isoformat(), row.id])
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        created_at, row_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError, UnicodeEncodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def paginate(query: Select, model: Any, cursor: Optional[str], limit: int) -> Select:
+    """Apply newest-first keyset pagination on (created_at, id)"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit)
+
+
+def set_next_cursor(response: Response, rows: Sequence[Any], limit: int):
+    """Expose the cursor for the next page when this page is full"""
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1])
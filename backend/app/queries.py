@@ -0,0 +1,9 @@
+from sqlalchemy import bindparam, select
+from app.models import ChatSession, Document, Workflow
+
+# Hot point lookups, built once and reused so only the bound value changes
+# between requests (pairs with the engine's compiled statement cache)
+WORKFLOW_BY_ID = select(Workflow).where(Workflow.id == bindparam("id"))
+DOCUMENT_BY_ID = select(Document).where(Document.id == bindparam("id"))
+DOCUMENT_BY_SHA256 = select(Document).where(Document.sha256 == bindparam("sha256")).limit(1)
+CHAT_SESSION_BY_SESSION_ID = select(ChatSession).where(ChatSession.session_id == bindparam("session_id"))
@@ -51,6 +51,7 @@ class DocumentResponse(DocumentBase):
     filename: str
     file_path: str
     content: Optional[str] = None
+    sha256: Optional[str] = None
     embeddings_created: bool
     created_at: datetime
     
@@ -68,8 +69,8 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     session_id: str
     response: str
-    context_used: Optional[Dict[str, Any]] = None
-    execution_logs: Optional[Dict[str, Any]] = None
+    context_used: Optional[Any] = None
+    execution_logs: Optional[List[Dict[str, Any]]] = None
     created_at: datetime
 
 
@@ -80,8 +81,8 @@ class ChatSessionResponse(BaseModel):
     document_id: Optional[int] = None
     user_query: str
     system_response: str
-    context_used: Optional[Dict[str, Any]] = None
-    execution_logs: Optional[Dict[str, Any]] = None
+    context_used: Optional[Any] = None
+    execution_logs: Optional[List[Dict[str, Any]]] = None
     created_at: datetime
     
     class Config:
@@ -116,6 +117,30 @@ class WorkflowExecutionRequest(BaseModel):
     document_id: Optional[int] = None
 
 
+class WorkflowGraph(BaseModel):
+    nodes: List[Dict[str, Any]]
+    edges: List[Dict[str, Any]]
+
+
+class ExecuteRequest(BaseModel):
+    workflow_id: Optional[int] = Field(None, alias="workflowId")
+    query: str = Field(..., min_length=1)
+    nodes: List[Dict[str, Any]] = []
+    edges: List[Dict[str, Any]] = []
+    
+    class Config:
+        populate_by_name = True
+
+
+class SendMessageRequest(BaseModel):
+    message: str = Field(..., min_length=1)
+    workflow_id: int = Field(..., alias="workflowId")
+    session_id: Optional[str] = Field(None, alias="sessionId")
+    
+    class Config:
+        populate_by_name = True
+
+
 class WorkflowExecutionResponse(BaseModel):
     success: bool
     response: str
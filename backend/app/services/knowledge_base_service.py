@@ -1,19 +1,30 @@
+import asyncio
+import hashlib
 import chromadb
+import numpy as np
 import fitz  # PyMuPDF
 import os
 import uuid
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
+from app.cache import cache_get, cache_incr, cache_set
 from app.config import settings
-from app.services.llm_service import LLMService
+from app.services.llm_service import get_llm_service
 import structlog
 
 logger = structlog.get_logger()
 
+# Texts per embeddings request; sub-batches are sent concurrently
+EMBEDDING_BATCH_SIZE = 96
+
+# Bumped whenever the collection changes, retiring every cached search result
+KB_GENERATION_KEY = "kb:generation"
+
 
 class KnowledgeBaseService:
     def __init__(self):
         self.chroma_client = chromadb.PersistentClient(path=settings.chroma_persist_directory)
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.collection_name = "documents"
         
         # Create or get collection
@@ -22,14 +33,23 @@ class KnowledgeBaseService:
         except:
             self.collection = self.chroma_client.create_collection(
                 name=self.collection_name,
-                metadata={"description": "Document embeddings for AI Stack"}
+                metadata={
+                    "description": "Document embeddings for AI Stack",
+                    "hnsw:space": "cosine",
+                    "hnsw:construction_ef": 200,
+                    "hnsw:M": 32,
+                    "hnsw:search_ef": 64
+                }
             )
+        
+        # Collections created before the cosine index still use Chroma's default squared L2
+        self.distance_space = (self.collection.metadata or {}).get("hnsw:space", "l2")
     
     async def process_document(self, file_path: str, document_id: int) -> Dict[str, Any]:
         """Process document and create embeddings"""
         try:
-            # Extract text from document
-            text_content = await self._extract_text(file_path)
+            # Extract text from document (blocking file IO and parsing, so in a thread)
+            text_content = await asyncio.to_thread(self._extract_text, file_path)
             
             # Split text into chunks
             chunks = self._split_text(text_content)
@@ -51,33 +71,27 @@ class KnowledgeBaseService:
             logger.error("Document processing failed", error=str(e), document_id=document_id)
             raise
     
-    async def _extract_text(self, file_path: str) -> str:
+    def _extract_text(self, file_path: str) -> str:
         """Extract text from various document formats"""
         file_extension = os.path.splitext(file_path)[1].lower()
         
         if file_extension == '.pdf':
-            return await self._extract_pdf_text(file_path)
+            return self._extract_pdf_text(file_path)
         elif file_extension in ['.txt', '.md']:
-            return await self._extract_text_file(file_path)
+            return self._extract_text_file(file_path)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
     
-    async def _extract_pdf_text(self, file_path: str) -> str:
+    def _extract_pdf_text(self, file_path: str) -> str:
         """Extract text from PDF using PyMuPDF"""
         try:
-            doc = fitz.open(file_path)
-            text = ""
-            
-            for page in doc:
-                text += page.get_text()
-            
-            doc.close()
-            return text.strip()
+            with fitz.open(file_path) as doc:
+                return "".join([page.get_text() for page in doc]).strip()
         except Exception as e:
             logger.error("PDF text extraction failed", error=str(e), file_path=file_path)
             raise
     
-    async def _extract_text_file(self, file_path: str) -> str:
+    def _extract_text_file(self, file_path: str) -> str:
         """Extract text from plain text files"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
@@ -99,11 +113,12 @@ class KnowledgeBaseService:
             
             # Try to break at sentence boundary
             if end < len(text):
-                # Look for sentence endings
-                for i in range(end, max(start + chunk_size - 100, start), -1):
-                    if text[i] in '.!?':
-                        end = i + 1
-                        break
+                # Look for the last sentence ending in text[window_start:end + 1]
+                window_start = max(start + chunk_size - 100, start) + 1
+                window = text[window_start:end + 1]
+                i = max(window.rfind('.'), window.rfind('!'), window.rfind('?'))
+                if i >= 0:
+                    end = window_start + i + 1
             
             chunk = text[start:end].strip()
             if chunk:
@@ -117,19 +132,30 @@ class KnowledgeBaseService:
     
     async def _generate_chunk_embeddings(self, chunks: List[str], document_id: int) -> List[Dict[str, Any]]:
         """Generate embeddings for text chunks"""
+        log = logger.bind(document_id=document_id)
         embeddings_data = []
+        errors = set()
+        starts = range(0, len(chunks), EMBEDDING_BATCH_SIZE)
         
-        for i, chunk in enumerate(chunks):
-            try:
-                # Generate embedding
-                embedding_result = await self.llm_service.generate_embeddings(
-                    chunk, provider="openai"  # Default to OpenAI
-                )
-                
+        results = await asyncio.gather(*[
+            self.llm_service.generate_embeddings_batch(
+                chunks[start:start + EMBEDDING_BATCH_SIZE], provider="openai"  # Default to OpenAI
+            )
+            for start in starts
+        ], return_exceptions=True)
+        
+        for start, embedding_result in zip(starts, results):
+            if isinstance(embedding_result, Exception):
+                errors.add(str(embedding_result))
+                continue
+            
+            # Rows are views into the batch's float32 array, not copies
+            for i, embedding in enumerate(embedding_result["embeddings"], start):
+                chunk = chunks[i]
                 embeddings_data.append({
                     "id": f"doc_{document_id}_chunk_{i}",
                     "text": chunk,
-                    "embedding": embedding_result["embeddings"],
+                    "embedding": embedding,
                     "metadata": {
                         "document_id": document_id,
                         "chunk_index": i,
@@ -137,11 +163,13 @@ class KnowledgeBaseService:
                         "embedding_model": embedding_result["model"]
                     }
                 })
-                
-            except Exception as e:
-                logger.error("Chunk embedding generation failed", 
-                           error=str(e), chunk_index=i, document_id=document_id)
-                continue
+        
+        # One summary per document rather than one event per failed batch
+        if errors:
+            log.error("Chunk embedding generation failed",
+                      failed_chunks=len(chunks) - len(embeddings_data), errors=sorted(errors))
+        log.info("Chunk embeddings generated",
+                 embedded_chunks=len(embeddings_data), total_chunks=len(chunks))
         
         return embeddings_data
     
@@ -154,17 +182,21 @@ class KnowledgeBaseService:
             # Prepare data for ChromaDB
             ids = [item["id"] for item in embeddings_data]
             texts = [item["text"] for item in embeddings_data]
-            embeddings = [item["embedding"] for item in embeddings_data]
+            embeddings = np.stack([item["embedding"] for item in embeddings_data])
             metadatas = [item["metadata"] for item in embeddings_data]
             
-            # Add to collection
-            self.collection.add(
+            # Add to collection (Chroma calls block, so run them in a thread)
+            await asyncio.to_thread(
+                self.collection.add,
                 ids=ids,
                 documents=texts,
-                embeddings=embeddings,
+                # Chroma 0.4 validates embeddings as lists; convert the whole array in one call
+                embeddings=embeddings.tolist(),
                 metadatas=metadatas
             )
             
+            await cache_incr(KB_GENERATION_KEY)
+            
             logger.info("Embeddings stored successfully", 
                        document_id=document_id, chunks_count=len(embeddings_data))
             
@@ -176,8 +208,16 @@ class KnowledgeBaseService:
                            top_k: int = 5, threshold: float = 0.7) -> List[Dict[str, Any]]:
         """Search for similar documents/chunks"""
         try:
+            generation = await cache_get(KB_GENERATION_KEY) or 0
+            search_key = "sim:" + hashlib.sha1(
+                f"{generation}|{query}|{document_id}|{top_k}|{threshold}".encode()
+            ).hexdigest()
+            cached = await cache_get(search_key)
+            if cached is not None:
+                return cached
+            
             # Generate query embedding
-            query_embedding = await self.llm_service.generate_embeddings(query, provider="openai")
+            query_embedding = await self._get_query_embedding(query)
             
             # Prepare where filter
             where_filter = {}
@@ -185,7 +225,8 @@ class KnowledgeBaseService:
                 where_filter["document_id"] = document_id
             
             # Search in ChromaDB
-            results = self.collection.query(
+            results = await asyncio.to_thread(
+                self.collection.query,
                 query_embeddings=[query_embedding["embeddings"]],
                 n_results=top_k,
                 where=where_filter if where_filter else None
@@ -199,8 +240,12 @@ class KnowledgeBaseService:
                     results["metadatas"][0],
                     results["distances"][0]
                 )):
-                    # Convert distance to similarity score
-                    similarity = 1 - distance
+                    # Convert distance to cosine similarity. Embeddings are unit length,
+                    # so squared L2 distance is 2 - 2 * cosine
+                    if self.distance_space == "cosine":
+                        similarity = 1 - distance
+                    else:
+                        similarity = 1 - distance / 2
                     
                     if similarity >= threshold:
                         similar_chunks.append({
@@ -210,17 +255,34 @@ class KnowledgeBaseService:
                             "rank": i + 1
                         })
             
+            await cache_set(search_key, similar_chunks, settings.similarity_cache_ttl)
             return similar_chunks
             
         except Exception as e:
             logger.error("Similarity search failed", error=str(e), query=query)
             raise
     
+    async def _get_query_embedding(self, text: str, provider: str = "openai") -> Dict[str, Any]:
+        """Generate an embedding, reusing one cached for identical text"""
+        key = (
+            f"emb:{provider}:{settings.openai_embedding_model}:{settings.openai_embedding_dimensions}:"
+            + hashlib.sha1(text.encode()).hexdigest()
+        )
+        cached = await cache_get(key)
+        if cached is not None:
+            return cached
+        
+        embedding = await self.llm_service.generate_embeddings(text, provider=provider)
+        await cache_set(key, embedding, settings.embedding_cache_ttl)
+        return embedding
+    
     async def get_document_chunks(self, document_id: int) -> List[Dict[str, Any]]:
         """Get all chunks for a specific document"""
         try:
-            results = self.collection.get(
-                where={"document_id": document_id}
+            results = await asyncio.to_thread(
+                self.collection.get,
+                where={"document_id": document_id},
+                include=["documents", "metadatas"]
             )
             
             chunks = []
@@ -238,21 +300,23 @@ class KnowledgeBaseService:
             logger.error("Failed to get document chunks", error=str(e), document_id=document_id)
             raise
     
-    async def delete_document_embeddings(self, document_id: int) -> bool:
+    async def delete_document_embeddings(self, document_id: int):
         """Delete all embeddings for a specific document"""
         try:
-            # Get all IDs for the document
-            results = self.collection.get(
+            # Chroma applies the filter itself; no need to fetch the IDs first
+            await asyncio.to_thread(
+                self.collection.delete,
                 where={"document_id": document_id}
             )
-            
-            if results["ids"]:
-                self.collection.delete(ids=results["ids"])
-                logger.info("Document embeddings deleted", document_id=document_id)
-                return True
-            
-            return False
+            await cache_incr(KB_GENERATION_KEY)
+            logger.info("Document embeddings deleted", document_id=document_id)
             
         except Exception as e:
             logger.error("Failed to delete document embeddings", error=str(e), document_id=document_id)
-            raise 
\ No newline at end of file
+            raise
+
+
+@lru_cache(maxsize=1)
+def get_knowledge_base_service() -> KnowledgeBaseService:
+    """Shared KnowledgeBaseService (one Chroma client per process)"""
+    return KnowledgeBaseService()
@@ -1,20 +1,80 @@
-import openai
+import asyncio
+import base64
+import io
+from functools import lru_cache
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
 import google.generativeai as genai
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List, Union
 from app.config import settings
 import structlog
 
 logger = structlog.get_logger()
 
 
+def _decode_embedding(embedding: Any) -> List[float]:
+    """Decode an OpenAI embedding requested with encoding_format="base64"
+
+    The base64 form carries raw little-endian float32 bytes.
+    """
+    if isinstance(embedding, list):
+        return embedding
+    return _decode_embedding_array(embedding).tolist()
+
+
+def _decode_embedding_array(embedding: Any) -> np.ndarray:
+    """Decode an OpenAI embedding into a float32 vector"""
+    if isinstance(embedding, list):
+        return np.asarray(embedding, dtype=np.float32)
+    return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+
+
+def format_context_blocks(blocks: List[Dict[str, Any]]) -> Optional[str]:
+    """Render structured context into the prompt's context text
+
+    Blocks are {"source": "document", "text", "score"} knowledge base chunks
+    or {"source": "web", "text"} search results. Document chunks come first,
+    then web results, each section separated by a blank line.
+    """
+    documents = [block for block in blocks if block["source"] == "document"]
+    web = [block for block in blocks if block["source"] == "web"]
+    if not documents and not web:
+        return None
+    
+    buffer = io.StringIO()
+    if documents:
+        buffer.write("Document Context:\n")
+        for index, block in enumerate(documents):
+            if index:
+                buffer.write("\n\n")
+            buffer.write("Document chunk (similarity: ")
+            buffer.write(format(block["score"], ".2f"))
+            buffer.write("):\n")
+            buffer.write(block["text"])
+    for block in web:
+        if buffer.tell():
+            buffer.write("\n\n")
+        buffer.write("Web Search Results:\n")
+        buffer.write(block["text"])
+    
+    return buffer.getvalue()
+
+
 class LLMService:
     def __init__(self):
         self.openai_client = None
         self.gemini_client = None
         
         if settings.openai_api_key:
-            openai.api_key = settings.openai_api_key
-            self.openai_client = openai
+            # One pooled HTTP/2 connection set for every chat and embedding call
+            self.openai_client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=httpx.AsyncClient(
+                    http2=True,
+                    limits=httpx.Limits(max_keepalive_connections=32, max_connections=128)
+                )
+            )
         
         if settings.gemini_api_key:
             genai.configure(api_key=settings.gemini_api_key)
@@ -28,11 +88,25 @@ class LLMService:
         model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        custom_prompt: Optional[str] = None
-    ) -> Dict[str, Any]:
+        custom_prompt: Optional[str] = None,
+        stream: bool = False,
+        context_blocks: Optional[List[Dict[str, Any]]] = None
+    ) -> Union[Dict[str, Any], AsyncIterator[str]]:
         """
         Generate response using specified LLM provider
+
+        With stream=True, returns an async iterator of text deltas instead
+        of the finished response. context_blocks, when given, is formatted
+        with format_context_blocks and used as the context.
         """
+        if context_blocks is not None:
+            context = format_context_blocks(context_blocks)
+        
+        if stream:
+            return self.stream_response(
+                query, context, provider, model, temperature, max_tokens, custom_prompt
+            )
+        
         try:
             if provider == "openai":
                 return await self._generate_openai_response(
@@ -48,22 +122,55 @@ class LLMService:
             logger.error("LLM generation failed", error=str(e), provider=provider)
             raise
     
-    async def _generate_openai_response(
+    async def stream_response(
         self,
         query: str,
         context: Optional[str] = None,
+        provider: str = "openai",
         model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: int = 1000,
         custom_prompt: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Generate response using OpenAI"""
-        if not self.openai_client:
-            raise ValueError("OpenAI client not configured")
-        
-        model = model or settings.openai_model
+    ) -> AsyncIterator[str]:
+        """
+        Stream response text deltas from the specified LLM provider
+        """
+        if provider == "openai":
+            stream = self._stream_openai_response(
+                query, context, model, temperature, max_tokens, custom_prompt
+            )
+        elif provider == "gemini":
+            stream = self._stream_gemini_response(
+                query, context, model, temperature, max_tokens, custom_prompt
+            )
+        else:
+            raise ValueError(f"Unsupported provider: {provider}")
         
-        # Build messages
+        try:
+            async for delta in stream:
+                yield delta
+        except Exception as e:
+            logger.error("LLM streaming failed", error=str(e), provider=provider)
+            raise
+    
+    async def aclose(self):
+        """Close the OpenAI client's connection pool"""
+        if self.openai_client:
+            await self.openai_client.close()
+    
+    def resolve_model(self, provider: str, model: Optional[str] = None) -> str:
+        """Get the model a provider call will use"""
+        if model:
+            return model
+        return settings.gemini_model if provider == "gemini" else settings.openai_model
+    
+    def _build_openai_messages(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        custom_prompt: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Build chat messages for OpenAI"""
         messages = []
         
         if custom_prompt:
@@ -82,7 +189,44 @@ class LLMService:
         else:
             messages.append({"role": "user", "content": query})
         
-        response = await self.openai_client.ChatCompletion.acreate(
+        return messages
+    
+    def _build_gemini_prompt(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        custom_prompt: Optional[str] = None
+    ) -> str:
+        """Build a single prompt for Gemini"""
+        if custom_prompt:
+            prompt = f"{custom_prompt}\n\n"
+        else:
+            prompt = "You are a helpful AI assistant. Provide accurate and helpful responses.\n\n"
+        
+        if context:
+            prompt += f"Context: {context}\n\nQuestion: {query}"
+        else:
+            prompt += f"Question: {query}"
+        
+        return prompt
+    
+    async def _generate_openai_response(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        custom_prompt: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Generate response using OpenAI"""
+        if not self.openai_client:
+            raise ValueError("OpenAI client not configured")
+        
+        model = model or settings.openai_model
+        messages = self._build_openai_messages(query, context, custom_prompt)
+        
+        response = await self.openai_client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
@@ -93,9 +237,38 @@ class LLMService:
             "response": response.choices[0].message.content,
             "model": model,
             "provider": "openai",
-            "usage": response.usage.dict() if response.usage else None
+            "usage": response.usage.model_dump() if response.usage else None
         }
     
+    async def _stream_openai_response(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        custom_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream response deltas from OpenAI"""
+        if not self.openai_client:
+            raise ValueError("OpenAI client not configured")
+        
+        model = model or settings.openai_model
+        messages = self._build_openai_messages(query, context, custom_prompt)
+        
+        response = await self.openai_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    
     async def _generate_gemini_response(
         self,
         query: str,
@@ -110,17 +283,7 @@ class LLMService:
             raise ValueError("Gemini client not configured")
         
         model = model or settings.gemini_model
-        
-        # Build prompt
-        if custom_prompt:
-            prompt = f"{custom_prompt}\n\n"
-        else:
-            prompt = "You are a helpful AI assistant. Provide accurate and helpful responses.\n\n"
-        
-        if context:
-            prompt += f"Context: {context}\n\nQuestion: {query}"
-        else:
-            prompt += f"Question: {query}"
+        prompt = self._build_gemini_prompt(query, context, custom_prompt)
         
         model_instance = genai.GenerativeModel(model)
         
@@ -139,6 +302,37 @@ class LLMService:
             "usage": None  # Gemini doesn't provide usage info in the same way
         }
     
+    async def _stream_gemini_response(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        custom_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream response deltas from Google Gemini"""
+        if not self.gemini_client:
+            raise ValueError("Gemini client not configured")
+        
+        model = model or settings.gemini_model
+        prompt = self._build_gemini_prompt(query, context, custom_prompt)
+        
+        model_instance = genai.GenerativeModel(model)
+        
+        response = await model_instance.generate_content_async(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_tokens
+            ),
+            stream=True
+        )
+        
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+    
     async def generate_embeddings(
         self,
         text: str,
@@ -156,22 +350,53 @@ class LLMService:
             logger.error("Embedding generation failed", error=str(e), provider=provider)
             raise
     
+    async def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        provider: str = "openai"
+    ) -> Dict[str, Any]:
+        """Generate embeddings for several texts in one request, preserving order
+
+        The embeddings come back as one float32 array of shape (len(texts), dim).
+        """
+        try:
+            if provider == "openai":
+                return await self._generate_openai_embeddings_batch(texts)
+            elif provider == "gemini":
+                return await self._generate_gemini_embeddings_batch(texts)
+            else:
+                raise ValueError(f"Unsupported provider: {provider}")
+        except Exception as e:
+            logger.error("Batch embedding generation failed", error=str(e),
+                         provider=provider, batch_size=len(texts))
+            raise
+    
     async def _generate_openai_embeddings(self, text: str) -> Dict[str, Any]:
         """Generate embeddings using OpenAI"""
         if not self.openai_client:
             raise ValueError("OpenAI client not configured")
         
-        response = await self.openai_client.Embedding.acreate(
+        response = await self.openai_client.embeddings.create(
             input=text,
-            model=settings.openai_embedding_model
+            **self._openai_embedding_options()
         )
         
         return {
-            "embeddings": response.data[0].embedding,
+            "embeddings": _decode_embedding(response.data[0].embedding),
             "model": settings.openai_embedding_model,
             "provider": "openai"
         }
     
+    def _openai_embedding_options(self) -> Dict[str, Any]:
+        """Model options shared by OpenAI embedding requests"""
+        # The SDK already fetches base64 when numpy is installed, but then decodes
+        # to lists; asking explicitly hands us the raw bytes for np.frombuffer
+        options = {"model": settings.openai_embedding_model, "encoding_format": "base64"}
+        if settings.openai_embedding_dimensions:
+            # openai 1.3.7's embeddings.create has no dimensions parameter
+            options["extra_body"] = {"dimensions": settings.openai_embedding_dimensions}
+        return options
+    
     async def _generate_gemini_embeddings(self, text: str) -> Dict[str, Any]:
         """Generate embeddings using Google Gemini"""
         if not self.gemini_client:
@@ -184,4 +409,46 @@ class LLMService:
             "embeddings": response.embedding,
             "model": settings.gemini_embedding_model,
             "provider": "gemini"
-        } 
\ No newline at end of file
+        }
+    
+    async def _generate_openai_embeddings_batch(self, texts: List[str]) -> Dict[str, Any]:
+        """Generate embeddings for a list of texts using OpenAI"""
+        if not self.openai_client:
+            raise ValueError("OpenAI client not configured")
+        
+        response = await self.openai_client.embeddings.create(
+            input=texts,
+            **self._openai_embedding_options()
+        )
+        
+        # Items carry their input position; don't rely on response order
+        data = sorted(response.data, key=lambda item: item.index)
+        return {
+            "embeddings": np.stack([_decode_embedding_array(item.embedding) for item in data]),
+            "model": settings.openai_embedding_model,
+            "provider": "openai"
+        }
+    
+    async def _generate_gemini_embeddings_batch(self, texts: List[str]) -> Dict[str, Any]:
+        """Generate embeddings for a list of texts using Google Gemini"""
+        if not self.gemini_client:
+            raise ValueError("Gemini client not configured")
+        
+        model = settings.gemini_embedding_model
+        if not model.startswith("models/"):
+            model = f"models/{model}"
+        
+        # genai.embed_content is synchronous; keep it off the event loop
+        response = await asyncio.to_thread(genai.embed_content, model=model, content=texts)
+        
+        return {
+            "embeddings": np.asarray(response["embedding"], dtype=np.float32),
+            "model": settings.gemini_embedding_model,
+            "provider": "gemini"
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_service() -> LLMService:
+    """Shared LLMService (providers configured once per process)"""
+    return LLMService()
@@ -1,5 +1,6 @@
 import httpx
 import asyncio
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from app.config import settings
 import structlog
@@ -11,6 +12,16 @@ class WebSearchService:
     def __init__(self):
         self.serpapi_key = settings.serpapi_api_key
         self.brave_key = settings.brave_api_key
+        # Pooled client kept for the process lifetime so searches reuse TLS connections
+        self.client = httpx.AsyncClient(
+            timeout=10,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=128)
+        )
+    
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
     
     async def search_web(self, query: str, provider: str = "serpapi", 
                         max_results: int = 5) -> List[Dict[str, Any]]:
@@ -33,67 +44,65 @@ class WebSearchService:
         if not self.serpapi_key:
             raise ValueError("SerpAPI key not configured")
         
-        async with httpx.AsyncClient() as client:
-            params = {
-                "q": query,
-                "api_key": self.serpapi_key,
-                "num": max_results,
-                "engine": "google"
-            }
-            
-            response = await client.get("https://serpapi.com/search", params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            results = []
-            if "organic_results" in data:
-                for result in data["organic_results"][:max_results]:
-                    results.append({
-                        "title": result.get("title", ""),
-                        "snippet": result.get("snippet", ""),
-                        "link": result.get("link", ""),
-                        "source": "SerpAPI"
-                    })
-            
-            return results
+        params = {
+            "q": query,
+            "api_key": self.serpapi_key,
+            "num": max_results,
+            "engine": "google"
+        }
+        
+        response = await self.client.get("https://serpapi.com/search", params=params)
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        results = []
+        if "organic_results" in data:
+            for result in data["organic_results"][:max_results]:
+                results.append({
+                    "title": result.get("title", ""),
+                    "snippet": result.get("snippet", ""),
+                    "link": result.get("link", ""),
+                    "source": "SerpAPI"
+                })
+        
+        return results
     
     async def _search_brave(self, query: str, max_results: int) -> List[Dict[str, Any]]:
         """Search using Brave Search API"""
         if not self.brave_key:
             raise ValueError("Brave API key not configured")
         
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Accept": "application/json",
-                "X-Subscription-Token": self.brave_key
-            }
-            
-            params = {
-                "q": query,
-                "count": max_results
-            }
-            
-            response = await client.get(
-                "https://api.search.brave.com/res/v1/web/search",
-                headers=headers,
-                params=params
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            results = []
-            if "web" in data and "results" in data["web"]:
-                for result in data["web"]["results"][:max_results]:
-                    results.append({
-                        "title": result.get("title", ""),
-                        "snippet": result.get("description", ""),
-                        "link": result.get("url", ""),
-                        "source": "Brave Search"
-                    })
-            
-            return results
+        headers = {
+            "Accept": "application/json",
+            "X-Subscription-Token": self.brave_key
+        }
+        
+        params = {
+            "q": query,
+            "count": max_results
+        }
+        
+        response = await self.client.get(
+            "https://api.search.brave.com/res/v1/web/search",
+            headers=headers,
+            params=params
+        )
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        results = []
+        if "web" in data and "results" in data["web"]:
+            for result in data["web"]["results"][:max_results]:
+                results.append({
+                    "title": result.get("title", ""),
+                    "snippet": result.get("description", ""),
+                    "link": result.get("url", ""),
+                    "source": "Brave Search"
+                })
+        
+        return results
     
     async def search_multiple_providers(self, query: str, providers: List[str] = None,
                                       max_results: int = 5) -> Dict[str, List[Dict[str, Any]]]:
@@ -101,10 +110,7 @@ class WebSearchService:
         if providers is None:
             providers = ["serpapi", "brave"]
         
-        tasks = []
-        for provider in providers:
-            task = self.search_web(query, provider, max_results)
-            tasks.append(task)
+        tasks = [self._search_with_timeout(query, provider, max_results) for provider in providers]
         
         try:
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -123,6 +129,14 @@ class WebSearchService:
             logger.error("Multiple provider search failed", error=str(e))
             raise
     
+    async def _search_with_timeout(self, query: str, provider: str,
+                                   max_results: int) -> List[Dict[str, Any]]:
+        """search_web bounded by the per-provider deadline"""
+        return await asyncio.wait_for(
+            self.search_web(query, provider, max_results),
+            timeout=settings.web_search_timeout
+        )
+    
     def format_search_results_for_context(self, results: List[Dict[str, Any]]) -> str:
         """Format search results for use as context in LLM"""
         if not results:
@@ -140,21 +154,37 @@ class WebSearchService:
     
     async def get_relevant_context(self, query: str, max_results: int = 3) -> str:
         """Get relevant web context for a query"""
+        # Query every configured provider at once and use the first useful answer
+        providers = [
+            provider for provider, key in (("serpapi", self.serpapi_key), ("brave", self.brave_key))
+            if key
+        ]
+        tasks = [
+            asyncio.create_task(self._search_with_timeout(query, provider, max_results))
+            for provider in providers
+        ]
+        
         try:
-            # Try SerpAPI first, fallback to Brave
-            providers_to_try = ["serpapi", "brave"]
-            
-            for provider in providers_to_try:
+            for next_done in asyncio.as_completed(tasks):
                 try:
-                    results = await self.search_web(query, provider, max_results)
-                    if results:
-                        return self.format_search_results_for_context(results)
+                    results = await next_done
                 except Exception as e:
-                    logger.warning(f"Search failed for {provider}, trying next provider", error=str(e))
+                    logger.warning("Search provider failed, waiting for the others", error=str(e))
                     continue
+                if results:
+                    return self.format_search_results_for_context(results)
             
             return ""
             
         except Exception as e:
             logger.error("Failed to get relevant context", error=str(e))
-            return "" 
\ No newline at end of file
+            return ""
+        finally:
+            for task in tasks:
+                task.cancel() 
+
+
+@lru_cache(maxsize=1)
+def get_web_search_service() -> WebSearchService:
+    """Shared WebSearchService (one HTTP connection pool per process)"""
+    return WebSearchService()
@@ -1,79 +1,186 @@
 import asyncio
 import time
 import uuid
-from typing import Dict, Any, List, Optional
-from app.services.llm_service import LLMService
-from app.services.knowledge_base_service import KnowledgeBaseService
-from app.services.web_search_service import WebSearchService
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, AsyncIterator, Callable, Tuple
+from app.services.llm_service import get_llm_service
+from app.services.knowledge_base_service import get_knowledge_base_service
+from app.services.web_search_service import get_web_search_service
 import structlog
 
 logger = structlog.get_logger()
 
 
+class LogEntry(NamedTuple):
+    """Execution log record for one node (timestamp is time.monotonic_ns())"""
+    timestamp: int
+    node_id: str
+    node_type: Optional[str]
+    action: str
+    result: Optional[str] = None
+    error: Optional[str] = None
+    
+    def to_dict(self, epoch_offset: float) -> Dict[str, Any]:
+        entry = {
+            "timestamp": epoch_offset + self.timestamp / 1e9,
+            "node_id": self.node_id,
+            "node_type": self.node_type,
+            "action": self.action
+        }
+        if self.result is not None:
+            entry["result"] = self.result
+        if self.error is not None:
+            entry["error"] = self.error
+        return entry
+
+
+class _NoLogs(dict):
+    """Log container that discards writes, for runs that don't collect logs"""
+    
+    def __setitem__(self, key, value):
+        pass
+
+
+_NO_LOGS = _NoLogs()
+
+
+def _render_logs(logs: Dict[str, LogEntry]) -> List[Dict[str, Any]]:
+    """Convert log records to the JSON shape returned to clients
+
+    Timestamps are reported as epoch seconds, anchored to the wall clock once
+    per render.
+    """
+    if not logs:
+        return []
+    epoch_offset = time.time() - time.monotonic_ns() / 1e9
+    return [entry.to_dict(epoch_offset) for entry in logs.values()]
+
+
 class WorkflowEngine:
     def __init__(self):
-        self.llm_service = LLMService()
-        self.kb_service = KnowledgeBaseService()
-        self.web_search_service = WebSearchService()
+        self.llm_service = get_llm_service()
+        self.kb_service = get_knowledge_base_service()
+        self.web_search_service = get_web_search_service()
+        
+        # Node handlers by type; all share _execute_node's call signature
+        self._dispatch = {
+            "userQuery": self._execute_user_query_node,
+            "knowledgeBase": self._execute_knowledge_base_node,
+            "llmEngine": self._execute_llm_engine_node,
+            "output": self._execute_output_node
+        }
     
     async def execute_workflow(
         self,
         workflow_data: Dict[str, Any],
         query: str,
-        document_id: Optional[int] = None
+        document_id: Optional[int] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        collect_logs: bool = True
     ) -> Dict[str, Any]:
         """
         Execute a workflow based on the provided nodes and edges
+
+        When on_token is given, LLM output is streamed and each text delta
+        is passed to it as soon as the provider produces it. With
+        collect_logs=False no per-node log records are built and "logs" is
+        empty.
         """
-        start_time = time.time()
-        execution_logs = []
+        start_time = time.perf_counter()
+        # Latest record per node, in start order
+        execution_logs: Dict[str, LogEntry] = {} if collect_logs else _NO_LOGS
         
         try:
             # Parse workflow
             nodes = workflow_data.get("nodes", [])
             edges = workflow_data.get("edges", [])
             
-            # Validate workflow
-            validation_result = self._validate_workflow(nodes, edges)
-            if not validation_result["valid"]:
+            # Validate and plan the workflow (cached per graph structure)
+            plan = self._get_plan(nodes, edges)
+            if not plan["valid"]:
                 return {
                     "success": False,
-                    "error": validation_result["error"],
-                    "execution_time": time.time() - start_time,
-                    "logs": execution_logs
+                    "error": plan["error"],
+                    "execution_time": time.perf_counter() - start_time,
+                    "logs": _render_logs(execution_logs)
                 }
             
-            # Build execution graph
-            execution_graph = self._build_execution_graph(nodes, edges)
-            
             # Execute workflow
+            nodes_by_id = {node["id"]: node for node in nodes}
             result = await self._execute_graph(
-                execution_graph, query, document_id, execution_logs
+                plan, nodes_by_id, query, document_id, execution_logs, on_token
             )
             
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             
             return {
                 "success": True,
                 "response": result["response"],
                 "context_used": result.get("context_used"),
                 "execution_time": execution_time,
-                "logs": execution_logs
+                "logs": _render_logs(execution_logs)
             }
             
         except Exception as e:
             logger.error("Workflow execution failed", error=str(e))
-            execution_time = time.time() - start_time
+            execution_time = time.perf_counter() - start_time
             
             return {
                 "success": False,
                 "error": str(e),
                 "execution_time": execution_time,
-                "logs": execution_logs
+                "logs": _render_logs(execution_logs)
             }
     
+    async def stream_workflow(
+        self,
+        workflow_data: Dict[str, Any],
+        query: str,
+        document_id: Optional[int] = None,
+        collect_logs: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a workflow, yielding LLM tokens as they arrive
+
+        Yields {"type": "token", "content": ...} events, then a single
+        {"type": "result", ...} event shaped like execute_workflow's return.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def run() -> Dict[str, Any]:
+            try:
+                return await self.execute_workflow(
+                    workflow_data, query, document_id, on_token=queue.put_nowait,
+                    collect_logs=collect_logs
+                )
+            finally:
+                queue.put_nowait(None)
+        
+        task = asyncio.create_task(run())
+        try:
+            while (token := await queue.get()) is not None:
+                yield {"type": "token", "content": token}
+            yield {"type": "result", **(await task)}
+        finally:
+            # Stop the workflow if the consumer goes away mid-stream
+            task.cancel()
+    
     def _validate_workflow(self, nodes: List[Dict], edges: List[Dict]) -> Dict[str, Any]:
         """Validate workflow structure"""
+        plan = self._get_plan(nodes, edges)
+        return {"valid": plan["valid"], "error": plan.get("error")}
+    
+    def _get_plan(self, nodes: List[Dict], edges: List[Dict]) -> Dict[str, Any]:
+        """Get the compiled execution plan for a workflow's structure"""
+        return _compile_plan(
+            tuple((node.get("id"), node.get("type")) for node in nodes),
+            tuple((edge.get("source"), edge.get("target")) for edge in edges)
+        )
+    
+    @staticmethod
+    def _check_workflow(nodes: List[Dict], edges: List[Dict]) -> Dict[str, Any]:
+        """Run the structural checks on a workflow"""
         if not nodes:
             return {"valid": False, "error": "No nodes found in workflow"}
         
@@ -91,13 +198,11 @@ class WorkflowEngine:
                     "error": f"Required node type '{required_type}' not found"
                 }
         
-        # Check for cycles (simple check)
-        if len(edges) >= len(nodes):
-            return {"valid": False, "error": "Workflow may contain cycles"}
-        
+        # Cycles are detected by the topological sort in _compile_plan
         return {"valid": True}
     
-    def _build_execution_graph(self, nodes: List[Dict], edges: List[Dict]) -> Dict[str, Any]:
+    @staticmethod
+    def _build_execution_graph(nodes: List[Dict], edges: List[Dict]) -> Dict[str, Any]:
         """Build execution graph from nodes and edges"""
         graph = {}
         
@@ -106,7 +211,7 @@ class WorkflowEngine:
             node_id = node["id"]
             graph[node_id] = {
                 "node": node,
-                "dependencies": [],
+                "in_degree": 0,
                 "dependents": []
             }
         
@@ -117,79 +222,158 @@ class WorkflowEngine:
             
             if source_id in graph and target_id in graph:
                 graph[source_id]["dependents"].append(target_id)
-                graph[target_id]["dependencies"].append(source_id)
+                graph[target_id]["in_degree"] += 1
+        
+        # Freeze adjacency once built
+        for node_data in graph.values():
+            node_data["dependents"] = tuple(node_data["dependents"])
         
         return graph
     
     async def _execute_graph(
         self,
-        graph: Dict[str, Any],
+        plan: Dict[str, Any],
+        nodes_by_id: Dict[str, Dict[str, Any]],
         query: str,
         document_id: Optional[int],
-        logs: List[Dict]
+        logs: Dict[str, LogEntry],
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
-        """Execute the workflow graph"""
-        # Find execution order (topological sort)
-        execution_order = self._topological_sort(graph)
-        
+        """Execute the workflow graph
+
+        A node starts as soon as its last dependency finishes, so independent
+        branches overlap their I/O and no node waits on an unrelated sibling.
+        Nodes run in a TaskGroup: the first failure cancels the rest. Plans
+        that are a single chain run their nodes in order, without tasks.
+        """
         # Store intermediate results
         node_results = {}
         
-        # Execute nodes in order
-        for node_id in execution_order:
-            node_data = graph[node_id]
-            node = node_data["node"]
+        in_degree = dict(plan["in_degree"])
+        dependents = plan["dependents"]
+        fused = plan["fused"]
+        result_views = plan["result_views"]
+        
+        def execute(node_id: str):
+            # Only the LLM node the output reports streams its tokens
+            node_on_token = on_token if node_id in plan["streamed"] else None
+            if node_id in fused:
+                return self._execute_fused_nodes(
+                    fused[node_id], node_id, nodes_by_id, query, document_id, node_results, logs, node_on_token
+                )
             
-            log_entry = {
-                "timestamp": time.time(),
-                "node_id": node_id,
-                "node_type": node.get("type"),
-                "action": "executing"
-            }
-            logs.append(log_entry)
+            # Hand nodes that read upstream results only the node types they look for
+            visible_results = node_results
+            if node_id in result_views:
+                visible_results = {
+                    result_id: node_results[result_id]
+                    for result_id in result_views[node_id] if result_id in node_results
+                }
+            return self._execute_logged_node(
+                node_id, nodes_by_id[node_id], query, document_id, visible_results, logs, node_on_token
+            )
+        
+        async def run(node_id: str):
+            node_results[node_id] = await execute(node_id)
             
-            try:
-                result = await self._execute_node(
-                    node, query, document_id, node_results
-                )
-                node_results[node_id] = result
-                
-                log_entry["action"] = "completed"
-                log_entry["result"] = "success"
-                
-            except Exception as e:
-                log_entry["action"] = "failed"
-                log_entry["result"] = "error"
-                log_entry["error"] = str(e)
-                raise
+            for dependent_id in dependents[node_id]:
+                in_degree[dependent_id] -= 1
+                if in_degree[dependent_id] == 0:
+                    start(dependent_id)
         
-        # Find output node result
-        output_node_id = None
-        for node_id, node_data in graph.items():
-            if node_data["node"].get("type") == "output":
-                output_node_id = node_id
-                break
+        def start(node_id: str):
+            task_group.create_task(run(node_id))
+        
+        if plan["sequence"]:
+            for node_id in plan["sequence"]:
+                node_results[node_id] = await execute(node_id)
+            return node_results[plan["output_node_id"]]
         
-        if output_node_id and output_node_id in node_results:
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for node_id, degree in list(in_degree.items()):
+                    if degree == 0:
+                        start(node_id)
+        except* Exception as group:
+            # Surface the first node failure itself, as before
+            raise group.exceptions[0] from None
+        
+        # Find output node result
+        output_node_id = plan["output_node_id"]
+        if output_node_id in node_results:
             return node_results[output_node_id]
         else:
             raise ValueError("No output node found or output node failed")
     
-    def _topological_sort(self, graph: Dict[str, Any]) -> List[str]:
+    async def _execute_logged_node(
+        self,
+        node_id: str,
+        node: Dict[str, Any],
+        query: str,
+        document_id: Optional[int],
+        node_results: Dict[str, Any],
+        logs: Dict[str, LogEntry],
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """Execute a node, recording its progress in the execution logs"""
+        if logs is _NO_LOGS:
+            return await self._execute_node(node, query, document_id, node_results, on_token)
+        
+        log_entry = LogEntry(time.monotonic_ns(), node_id, node.get("type"), "executing")
+        logs[node_id] = log_entry
+        
+        try:
+            result = await self._execute_node(
+                node, query, document_id, node_results, on_token
+            )
+            
+            logs[node_id] = log_entry._replace(action="completed", result="success")
+            return result
+            
+        except asyncio.CancelledError:
+            # A sibling failed (or the client went away) and the run was stopped
+            logs[node_id] = log_entry._replace(action="cancelled", result="cancelled")
+            raise
+        except Exception as e:
+            logs[node_id] = log_entry._replace(action="failed", result="error", error=str(e))
+            raise
+    
+    async def _execute_fused_nodes(
+        self,
+        kb_node_id: str,
+        llm_node_id: str,
+        nodes_by_id: Dict[str, Dict[str, Any]],
+        query: str,
+        document_id: Optional[int],
+        node_results: Dict[str, Any],
+        logs: Dict[str, LogEntry],
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """Execute a knowledgeBase node and the llmEngine node it alone feeds as one task
+
+        The LLM node sees only the knowledge base result, handed over directly
+        rather than found by scanning every node result.
+        """
+        kb_result = await self._execute_logged_node(
+            kb_node_id, nodes_by_id[kb_node_id], query, document_id, node_results, logs
+        )
+        node_results[kb_node_id] = kb_result
+        
+        return await self._execute_logged_node(
+            llm_node_id, nodes_by_id[llm_node_id], query, document_id,
+            {kb_node_id: kb_result}, logs, on_token
+        )
+    
+    @staticmethod
+    def _topological_sort(graph: Dict[str, Any]) -> List[str]:
         """Perform topological sort to determine execution order"""
-        in_degree = {}
-        queue = []
+        in_degree = {node_id: node_data["in_degree"] for node_id, node_data in graph.items()}
+        queue = deque(node_id for node_id, degree in in_degree.items() if degree == 0)
         result = []
         
-        # Initialize in-degree
-        for node_id in graph:
-            in_degree[node_id] = len(graph[node_id]["dependencies"])
-            if in_degree[node_id] == 0:
-                queue.append(node_id)
-        
         # Process queue
         while queue:
-            node_id = queue.pop(0)
+            node_id = queue.popleft()
             result.append(node_id)
             
             for dependent_id in graph[node_id]["dependents"]:
@@ -207,32 +391,25 @@ class WorkflowEngine:
         node: Dict[str, Any],
         query: str,
         document_id: Optional[int],
-        node_results: Dict[str, Any]
+        node_results: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Execute a single node"""
         node_type = node.get("type")
-        node_data = node.get("data", {})
-        
-        if node_type == "userQuery":
-            return await self._execute_user_query_node(query, node_data)
-        
-        elif node_type == "knowledgeBase":
-            return await self._execute_knowledge_base_node(
-                query, document_id, node_data, node_results
-            )
-        
-        elif node_type == "llmEngine":
-            return await self._execute_llm_engine_node(
-                query, node_data, node_results
-            )
-        
-        elif node_type == "output":
-            return await self._execute_output_node(node_data, node_results)
-        
-        else:
+        handler = self._dispatch.get(node_type)
+        if handler is None:
             raise ValueError(f"Unknown node type: {node_type}")
+        
+        return await handler(query, document_id, node.get("data", {}), node_results, on_token)
     
-    async def _execute_user_query_node(self, query: str, node_data: Dict) -> Dict[str, Any]:
+    async def _execute_user_query_node(
+        self,
+        query: str,
+        document_id: Optional[int],
+        node_data: Dict,
+        node_results: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """Execute user query node"""
         return {
             "type": "userQuery",
@@ -245,7 +422,8 @@ class WorkflowEngine:
         query: str,
         document_id: Optional[int],
         node_data: Dict,
-        node_results: Dict[str, Any]
+        node_results: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Execute knowledge base node"""
         try:
@@ -258,17 +436,11 @@ class WorkflowEngine:
                 query, document_id, top_k, similarity_threshold
             )
             
-            # Format context
-            context_parts = []
-            for chunk in similar_chunks:
-                context_parts.append(f"Document chunk (similarity: {chunk['similarity']:.2f}):\n{chunk['text']}")
-            
-            context = "\n\n".join(context_parts) if context_parts else ""
-            
+            # Chunks stay structured; the LLM service formats them into the prompt
             return {
                 "type": "knowledgeBase",
                 "query": query,
-                "context": context,
+                "chunks": similar_chunks,
                 "chunks_found": len(similar_chunks),
                 "similarity_threshold": similarity_threshold
             }
@@ -278,7 +450,7 @@ class WorkflowEngine:
             return {
                 "type": "knowledgeBase",
                 "query": query,
-                "context": "",
+                "chunks": [],
                 "chunks_found": 0,
                 "error": str(e)
             }
@@ -286,10 +458,17 @@ class WorkflowEngine:
     async def _execute_llm_engine_node(
         self,
         query: str,
+        document_id: Optional[int],
         node_data: Dict,
-        node_results: Dict[str, Any]
+        node_results: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Execute LLM engine node"""
+        # Start the web search first so it overlaps with context assembly
+        web_task = None
+        if node_data.get("useWebSearch", False):
+            web_task = asyncio.create_task(self.web_search_service.get_relevant_context(query))
+        
         try:
             # Get configuration
             provider = node_data.get("provider", "openai")
@@ -299,32 +478,43 @@ class WorkflowEngine:
             custom_prompt = node_data.get("customPrompt", "")
             use_web_search = node_data.get("useWebSearch", False)
             
-            # Build context from previous nodes
-            context_parts = []
-            
-            # Add knowledge base context if available
-            for node_id, result in node_results.items():
-                if result.get("type") == "knowledgeBase" and result.get("context"):
-                    context_parts.append(f"Document Context:\n{result['context']}")
+            # Collect context blocks from previous nodes
+            context_blocks = [
+                {"source": "document", "text": chunk["text"], "score": chunk["similarity"]}
+                for result in node_results.values() if result.get("type") == "knowledgeBase"
+                for chunk in result.get("chunks", ())
+            ]
             
             # Add web search context if enabled
-            if use_web_search:
-                web_context = await self.web_search_service.get_relevant_context(query)
+            if web_task:
+                web_context = await web_task
                 if web_context:
-                    context_parts.append(f"Web Search Results:\n{web_context}")
+                    context_blocks.append({"source": "web", "text": web_context})
             
-            context = "\n\n".join(context_parts) if context_parts else None
+            llm_kwargs = {
+                "query": query,
+                "context_blocks": context_blocks,
+                "provider": provider,
+                "model": model,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "custom_prompt": custom_prompt
+            }
             
-            # Generate response
-            llm_result = await self.llm_service.generate_response(
-                query=query,
-                context=context,
-                provider=provider,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                custom_prompt=custom_prompt
-            )
+            # Generate response, forwarding deltas when streaming
+            if on_token:
+                response_parts = []
+                deltas = await self.llm_service.generate_response(**llm_kwargs, stream=True)
+                async for delta in deltas:
+                    response_parts.append(delta)
+                    on_token(delta)
+                llm_result = {
+                    "response": "".join(response_parts),
+                    "model": self.llm_service.resolve_model(provider, model),
+                    "provider": provider
+                }
+            else:
+                llm_result = await self.llm_service.generate_response(**llm_kwargs)
             
             return {
                 "type": "llmEngine",
@@ -332,7 +522,7 @@ class WorkflowEngine:
                 "response": llm_result["response"],
                 "model": llm_result["model"],
                 "provider": llm_result["provider"],
-                "context_used": context is not None,
+                "context_used": bool(context_blocks),
                 "web_search_used": use_web_search
             }
             
@@ -344,11 +534,19 @@ class WorkflowEngine:
                 "response": f"Error generating response: {str(e)}",
                 "error": str(e)
             }
+        
+        finally:
+            # Also covers cancellation, so the search is never left running unawaited
+            if web_task and not web_task.done():
+                web_task.cancel()
     
     async def _execute_output_node(
         self,
+        query: str,
+        document_id: Optional[int],
         node_data: Dict,
-        node_results: Dict[str, Any]
+        node_results: Dict[str, Any],
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """Execute output node"""
         # Find the LLM engine result
@@ -371,4 +569,105 @@ class WorkflowEngine:
                 "type": "output",
                 "response": "No LLM response available",
                 "error": "LLM engine not found in workflow"
-            } 
\ No newline at end of file
+            }
+
+
+@lru_cache(maxsize=256)
+def _compile_plan(
+    nodes_key: Tuple[Tuple[str, str], ...],
+    edges_key: Tuple[Tuple[str, str], ...]
+) -> Dict[str, Any]:
+    """Validate a workflow structure and derive its execution plan
+
+    Keyed on (id, type) per node and (source, target) per edge, which is all
+    validation and scheduling look at, so node configuration edits reuse the
+    plan. Callers must not mutate the result.
+    """
+    nodes = [{"id": node_id, "type": node_type} for node_id, node_type in nodes_key]
+    edges = [{"source": source, "target": target} for source, target in edges_key]
+    
+    validation_result = WorkflowEngine._check_workflow(nodes, edges)
+    if not validation_result["valid"]:
+        return validation_result
+    
+    graph = WorkflowEngine._build_execution_graph(nodes, edges)
+    try:
+        WorkflowEngine._topological_sort(graph)  # Rejects cycles
+    except ValueError as e:
+        return {"valid": False, "error": str(e)}
+    
+    in_degree = {node_id: node_data["in_degree"] for node_id, node_data in graph.items()}
+    dependents = {node_id: node_data["dependents"] for node_id, node_data in graph.items()}
+    
+    node_types = dict(nodes_key)
+    by_type: Dict[str, List[str]] = {}
+    for node_id, node_type in node_types.items():
+        by_type.setdefault(node_type, []).append(node_id)
+    
+    # llmEngine nodes read knowledgeBase results; output nodes read llmEngine results
+    read_types = {"llmEngine": "knowledgeBase", "output": "llmEngine"}
+    result_views = {
+        node_id: tuple(by_type.get(read_types[node_type], ()))
+        for node_id, node_type in node_types.items() if node_type in read_types
+    }
+    
+    # The output node reports the first llmEngine node upstream of it; only that
+    # node's tokens are streamed, so concurrent LLM branches don't interleave
+    output_node_id = by_type["output"][0]
+    upstream = set()
+    pending = [output_node_id]
+    while pending:
+        target = pending.pop()
+        for node_id, targets in dependents.items():
+            if target in targets and node_id not in upstream:
+                upstream.add(node_id)
+                pending.append(node_id)
+    llm_node_ids = [node_id for node_id in result_views[output_node_id] if node_id in upstream]
+    if llm_node_ids:
+        result_views[output_node_id] = (llm_node_ids[0],)
+    streamed = frozenset(result_views[output_node_id][:1])
+    
+    # Fuse knowledgeBase -> llmEngine pairs where the KB node feeds only that LLM
+    # node and the LLM node depends on nothing else: they run as one task
+    fused = {}
+    for node_id, node_type in node_types.items():
+        if node_type != "knowledgeBase" or len(dependents[node_id]) != 1:
+            continue
+        llm_node_id = dependents[node_id][0]
+        if node_types[llm_node_id] == "llmEngine" and in_degree[llm_node_id] == 1:
+            fused[llm_node_id] = node_id
+    
+    # The fused task takes the KB node's place in the schedule
+    for llm_node_id, kb_node_id in fused.items():
+        in_degree[llm_node_id] = in_degree.pop(kb_node_id)
+        dependents.pop(kb_node_id)
+        for node_id, targets in dependents.items():
+            if kb_node_id in targets:
+                dependents[node_id] = tuple(llm_node_id if target == kb_node_id else target for target in targets)
+    
+    # A plan with one root where every step feeds at most one other is a chain
+    # (the plan is acyclic): it can run straight through in order
+    sequence = None
+    roots = [node_id for node_id, degree in in_degree.items() if degree == 0]
+    if len(roots) == 1 and all(len(targets) <= 1 for targets in dependents.values()):
+        sequence = [roots[0]]
+        while dependents[sequence[-1]]:
+            sequence.append(dependents[sequence[-1]][0])
+        sequence = tuple(sequence)
+    
+    return {
+        "valid": True,
+        "output_node_id": output_node_id,
+        "in_degree": in_degree,
+        "dependents": dependents,
+        "fused": fused,
+        "result_views": result_views,
+        "streamed": streamed,
+        "sequence": sequence
+    }
+
+
+@lru_cache(maxsize=1)
+def get_workflow_engine() -> WorkflowEngine:
+    """Shared WorkflowEngine for the process"""
+    return WorkflowEngine()
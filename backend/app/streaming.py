@@ -0,0 +1,51 @@
+from typing import Any, AsyncIterator, Callable, Dict
+import orjson
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+EVENT_STREAM = "text/event-stream"
+
+
+def accepts_event_stream(headers: Headers) -> bool:
+    """Whether the client asked for a Server-Sent Events response"""
+    return EVENT_STREAM in headers.get("accept", "")
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+async def relay_workflow_events(
+    events: AsyncIterator[Dict[str, Any]],
+    on_result: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> AsyncIterator[str]:
+    """Relay WorkflowEngine.stream_workflow events as SSE
+
+    Tokens are sent as "token" events. A successful result is passed to
+    on_result, whose return value is sent as the closing "done" event.
+    """
+    async for event in events:
+        if event["type"] == "token":
+            yield sse_event("token", {"content": event["content"]})
+        elif event["success"]:
+            yield sse_event("done", on_result(event))
+        else:
+            yield sse_event("error", {
+                "detail": f"Workflow execution failed: {event.get('error', 'Unknown error')}"
+            })
+
+
+class EventStreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip middleware that leaves event streams alone
+
+    Compressing an event stream buffers it inside zlib, which holds tokens
+    back until enough output accumulates.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and accepts_event_stream(Headers(scope=scope)):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
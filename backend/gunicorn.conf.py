@@ -0,0 +1,18 @@
+"""Gunicorn configuration for AI Stack Backend"""
+
+import os
+
+from app.config import settings
+
+# Uvicorn workers run the asyncio loop on uvloop + httptools (uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+# One process by default: each worker would open its own embedded Chroma store
+# on the shared chroma_db directory, with its own in-memory index. Scale out
+# only once Chroma runs as a server.
+workers = int(os.getenv("WEB_CONCURRENCY", settings.uvicorn_workers))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Async workers don't benefit from threads
+threads = 1
+keepalive = 5
+graceful_timeout = 30
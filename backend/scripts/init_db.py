@@ -7,14 +7,19 @@ import os
 import sys
 import asyncio
 from sqlalchemy import create_engine, text
-from sqlalchemy.exc import OperationalError
+from psycopg2 import errors as pg_errors
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine
 from app.config import settings
-from app.database import engine, Base
+from app.database import Base, get_async_database_url
 from app.models import Workflow, Document, ChatSession
 import structlog
 
 logger = structlog.get_logger()
 
+# Setup talks to the app database over asyncpg, like the app itself
+engine = create_async_engine(get_async_database_url(settings.database_url))
+
 
 def create_database():
     """Create database if it doesn't exist"""
@@ -30,17 +35,18 @@ def create_database():
             # Connect to PostgreSQL server
             engine = create_engine(base_url + '/postgres')
             
-            with engine.connect() as conn:
-                # Check if database exists
-                result = conn.execute(text(
-                    "SELECT 1 FROM pg_database WHERE datname = :db_name"
-                ), {"db_name": db_name})
+            # CREATE DATABASE can't run inside a transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                # Identifiers can't be bound parameters; quote the name instead
+                quoted_name = conn.dialect.identifier_preparer.quote_identifier(db_name)
                 
-                if not result.fetchone():
-                    # Create database
-                    conn.execute(text(f"CREATE DATABASE {db_name}"))
+                # Just try to create it; an existing database is not an error
+                try:
+                    conn.execute(text(f"CREATE DATABASE {quoted_name}"))
                     logger.info(f"Database '{db_name}' created successfully")
-                else:
+                except ProgrammingError as e:
+                    if not isinstance(e.orig, pg_errors.DuplicateDatabase):
+                        raise
                     logger.info(f"Database '{db_name}' already exists")
                     
     except Exception as e:
@@ -48,21 +54,22 @@ def create_database():
         raise
 
 
-def create_tables():
+async def create_tables():
     """Create all database tables"""
     try:
-        Base.metadata.create_all(bind=engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Failed to create tables: {e}")
         raise
 
 
-def test_connection():
+async def test_connection():
     """Test database connection"""
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         logger.info("Database connection test successful")
         return True
     except Exception as e:
@@ -70,96 +77,110 @@ def test_connection():
         return False
 
 
-def create_sample_data():
+async def create_sample_data():
     """Create sample data for testing"""
     try:
-        from sqlalchemy.orm import sessionmaker
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        from sqlalchemy import insert, literal, select
+        
+        sample_workflow = dict(
+            name="Sample Document Q&A Workflow",
+            description="A sample workflow for answering questions about documents",
+            nodes=[
+                {
+                    "id": "1",
+                    "type": "userQuery",
+                    "position": {"x": 100, "y": 100},
+                    "data": {}
+                },
+                {
+                    "id": "2",
+                    "type": "knowledgeBase",
+                    "position": {"x": 300, "y": 100},
+                    "data": {
+                        "similarityThreshold": 0.7,
+                        "topK": 5
+                    }
+                },
+                {
+                    "id": "3",
+                    "type": "llmEngine",
+                    "position": {"x": 500, "y": 100},
+                    "data": {
+                        "provider": "openai",
+                        "model": "gpt-3.5-turbo",
+                        "temperature": 0.7,
+                        "maxTokens": 1000
+                    }
+                },
+                {
+                    "id": "4",
+                    "type": "output",
+                    "position": {"x": 700, "y": 100},
+                    "data": {}
+                }
+            ],
+            edges=[
+                {"source": "1", "target": "2"},
+                {"source": "2", "target": "3"},
+                {"source": "3", "target": "4"}
+            ],
+            is_active=True
+        )
         
-        with SessionLocal() as db:
-            # Check if sample workflow already exists
-            existing_workflow = db.query(Workflow).filter(
-                Workflow.name == "Sample Document Q&A Workflow"
-            ).first()
+        # One INSERT ... SELECT ... WHERE NOT EXISTS; an existing workflow with
+        # this name is left alone
+        columns = Workflow.__table__.c
+        already_exists = select(Workflow.id).where(Workflow.name == sample_workflow["name"]).exists()
+        stmt = insert(Workflow).from_select(
+            list(sample_workflow),
+            select(*(
+                literal(value, type_=columns[key].type) for key, value in sample_workflow.items()
+            )).where(~already_exists)
+        ).returning(Workflow.id)
+        
+        async with engine.begin() as conn:
+            created = (await conn.execute(stmt)).scalar_one_or_none()
             
-            if not existing_workflow:
-                # Create sample workflow
-                sample_workflow = Workflow(
-                    name="Sample Document Q&A Workflow",
-                    description="A sample workflow for answering questions about documents",
-                    nodes=[
-                        {
-                            "id": "1",
-                            "type": "userQuery",
-                            "position": {"x": 100, "y": 100},
-                            "data": {}
-                        },
-                        {
-                            "id": "2",
-                            "type": "knowledgeBase",
-                            "position": {"x": 300, "y": 100},
-                            "data": {
-                                "similarityThreshold": 0.7,
-                                "topK": 5
-                            }
-                        },
-                        {
-                            "id": "3",
-                            "type": "llmEngine",
-                            "position": {"x": 500, "y": 100},
-                            "data": {
-                                "provider": "openai",
-                                "model": "gpt-3.5-turbo",
-                                "temperature": 0.7,
-                                "maxTokens": 1000
-                            }
-                        },
-                        {
-                            "id": "4",
-                            "type": "output",
-                            "position": {"x": 700, "y": 100},
-                            "data": {}
-                        }
-                    ],
-                    edges=[
-                        {"source": "1", "target": "2"},
-                        {"source": "2", "target": "3"},
-                        {"source": "3", "target": "4"}
-                    ],
-                    is_active=True
-                )
-                
-                db.add(sample_workflow)
-                db.commit()
-                logger.info("Sample workflow created successfully")
-            else:
-                logger.info("Sample workflow already exists")
+        if created is not None:
+            logger.info("Sample workflow created successfully")
+        else:
+            logger.info("Sample workflow already exists")
                 
     except Exception as e:
         logger.error(f"Failed to create sample data: {e}")
         raise
 
 
-def main():
-    """Main initialization function"""
-    logger.info("Starting database initialization...")
-    
+async def initialize() -> bool:
+    """Run the initialization steps, returning whether they succeeded"""
     try:
         # Test connection first
-        if not test_connection():
+        if not await test_connection():
             logger.info("Attempting to create database...")
-            create_database()
+            # Runs against the server's postgres database over psycopg2
+            await asyncio.to_thread(create_database)
             
             # Test connection again
-            if not test_connection():
+            if not await test_connection():
                 logger.error("Database connection failed after creation")
-                sys.exit(1)
+                return False
         
-        # Create tables
-        create_tables()
+        # Create tables, then the sample data that goes into them
+        await create_tables()
+        await create_sample_data()
+        return True
         
-        # Create sample data
-        create_sample_data()
+    finally:
+        await engine.dispose()
+
+
+def main():
+    """Main initialization function"""
+    logger.info("Starting database initialization...")
+    
+    try:
+        if not asyncio.run(initialize()):
+            sys.exit(1)
         
         logger.info("Database initialization completed successfully!")
         
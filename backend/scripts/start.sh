@@ -18,7 +18,7 @@ fi
 # Check if running in Docker
 if [ -f /.dockerenv ]; then
     echo "🐳 Running in Docker container..."
-    exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+    exec gunicorn app.main:app -c gunicorn.conf.py
 else
     echo "💻 Running in local development mode..."
     